@@ -1,17 +1,53 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response
+from flask import (Flask, render_template, request, redirect, url_for, flash, jsonify, make_response, session,
+                   get_template_attribute)
+from flask.json.provider import DefaultJSONProvider
+from markupsafe import Markup, escape
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
-from datetime import datetime, date
+from werkzeug.http import is_resource_modified
+from datetime import datetime, date, time, timezone
+from functools import wraps
 import sqlite3
+import hashlib
+import json
 import os
 import csv
 import io
-from apscheduler.schedulers.background import BackgroundScheduler
-from email_service import send_reminder_email, check_and_send_reminders, send_manual_reminder
-from database import init_db, get_db_connection
+import zlib
+from email_service import send_reminder_email, send_manual_reminder
+from log_archive import log_archiver, ARCHIVE_TABLES
+from job_history import get_job_run_overview, get_job_runs, get_scheduled_jobs, sparkline_points
+from job_lease import JOB_MISFIRE_GRACE_SECONDS
+from fragment_cache import fragment_cache, FEEDBACK_FRAGMENTS
+from live_events import publish_event, live_event_broker, EVENT_FEEDBACK, EVENT_QUOTA
+from email_outbox import (enqueue_status_update_notification, enqueue_deletion_notification,
+                          get_outbox_counts, get_dead_letters, requeue_dead_letters, OUTBOX_DEAD, OUTBOX_PENDING)
+from database import (init_db, get_db_connection, db_connection, db_manager, fetch_feedback, fetch_feedback_page,
+                      search_feedback_page, count_feedback_by_status, get_feedback_stats, get_daily_count,
+                      reserve_daily_slot, release_daily_slot, get_notification_stats,
+                      fetch_notification_logs_page, fetch_operation_logs_page, fetch_users_status_page,
+                      day_range, encode_cursor, get_data_versions, Page, SNIPPET_START, SNIPPET_END)
+
+class JSONProvider(DefaultJSONProvider):
+    """JSON序列化：datetime输出为与数据库一致的 YYYY-MM-DD HH:MM:SS 格式"""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime):
+            return o.isoformat(' ')
+        return DefaultJSONProvider.default(o)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
+app.json = JSONProvider(app)
+# 列表分页：默认每页条数和 per_page 参数允许的最大值
+app.config['PAGE_SIZE'] = int(os.getenv('PAGE_SIZE', '20'))
+app.config['MAX_PAGE_SIZE'] = 100
+# CSV导出每批读取的行数
+app.config['EXPORT_CHUNK_SIZE'] = int(os.getenv('EXPORT_CHUNK_SIZE', '500'))
+
+# 每个请求绑定一个池化数据库连接，请求结束时统一归还
+db_manager.init_app(app)
 
 # 初始化Flask-Login
 login_manager = LoginManager()
@@ -33,11 +69,123 @@ def load_user(user_id):
     """加载用户信息"""
     conn = get_db_connection()
     user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-    conn.close()
     if user:
         return User(user['id'], user['username'], user['email'], user['name'], user['is_admin'])
     return None
 
+@app.template_filter('highlight')
+def highlight_filter(snippet):
+    """将全文检索摘要中的高亮标记转换为<mark>标签（内容先做HTML转义）"""
+    if not snippet:
+        return ''
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>'))
+
+def get_page_args(prefix: str = ''):
+    """读取分页参数 (after, before, page_size)，prefix 用于同一页面内的多个列表"""
+    try:
+        page_size = int(request.args.get('per_page', app.config['PAGE_SIZE']))
+    except ValueError:
+        page_size = app.config['PAGE_SIZE']
+    page_size = max(1, min(page_size, app.config['MAX_PAGE_SIZE']))
+    return request.args.get(f'{prefix}after'), request.args.get(f'{prefix}before'), page_size
+
+# 归档日志不含关联的姓名，读取时按用户ID从热库补上：表名 -> (用户ID列, 姓名字段)
+ARCHIVED_LOG_NAMES = {
+    'notification_logs': ('user_id', 'user_name'),
+    'operation_logs': ('operator_id', 'operator_name'),
+}
+
+def attach_user_names(conn, table: str, rows: list):
+    """为归档日志补上与热库查询一致的姓名字段（一次查询）"""
+    if table not in ARCHIVED_LOG_NAMES or not rows:
+        return
+    id_column, name_field = ARCHIVED_LOG_NAMES[table]
+    user_ids = sorted({row[id_column] for row in rows if row[id_column] is not None})
+    names = {}
+    if user_ids:
+        names = {user['id']: user['name'] for user in conn.execute(
+            f"SELECT id, name FROM users WHERE id IN ({', '.join(['?'] * len(user_ids))})", user_ids
+        )}
+    for row in rows:
+        row[name_field] = names.get(row[id_column])
+
+def extend_with_archived_logs(page: Page, table: str, alias: str, conditions: list, params: list,
+                              after, page_size: int, since=None, until=None) -> Page:
+    """热库已读完时，从最后一条记录之后继续读取归档月份中更早的记录补足一页"""
+    if page.next_cursor is not None:
+        return page
+    column = ARCHIVE_TABLES[table]
+    logs = page.items
+    if logs:
+        after = encode_cursor(logs[-1][column], str(logs[-1]['id']))
+    remaining = page_size - len(logs)
+    archived = log_archiver.fetch_archived_rows(table, alias, conditions, params,
+                                                after=after, limit=remaining + 1,
+                                                since=since, until=until)
+    attach_user_names(get_db_connection(), table, archived)
+    logs = logs + archived[:remaining]
+    next_cursor = None
+    if len(archived) > remaining:
+        next_cursor = encode_cursor(logs[-1][column], str(logs[-1]['id']))
+    return Page(logs, next_cursor=next_cursor)
+
+def publish_feedback_event(conn, action: str, feedback_id: str, user_id: int, status: str = None):
+    """在当前事务中发布反馈变更事件（created/updated/deleted），附带最新状态计数供面板更新徽标"""
+    publish_event(conn, EVENT_FEEDBACK, {
+        'action': action,
+        'id': feedback_id,
+        'user_id': user_id,
+        'status': status,
+        'stats': get_feedback_stats(conn),
+    }, user_id)
+
+def publish_quota_event(conn, user_id: int, day: str):
+    """在当前事务中发布某用户某日提交数量的变化"""
+    publish_event(conn, EVENT_QUOTA, {
+        'user_id': user_id,
+        'day': day,
+        'count': get_daily_count(conn, user_id, day),
+    }, user_id)
+
+def conditional_view(*scopes, per_user=False):
+    """条件请求：按数据版本生成 ETag/Last-Modified，数据未变化时直接返回304
+
+    scopes 为页面依赖的数据范围（feedback、users、notification_logs），per_user 时
+    加上当前用户的范围 user:<id>。版本号由数据库触发器在每次写入时递增，命中时只读取
+    版本表，不执行页面查询和模板渲染。页面还与当前用户和日期有关，一并计入 ETag；
+    有待显示的提示消息时不做条件处理。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if session.get('_flashes'):
+                return view(*args, **kwargs)
+            
+            names = list(scopes) + ([f'user:{current_user.id}'] if per_user else [])
+            versions, updated_at = get_data_versions(get_db_connection(), names)
+            today = date.today()
+            key = json.dumps([request.full_path, names, versions, current_user.id,
+                              bool(current_user.is_admin), today.isoformat()])
+            etag = hashlib.sha1(key.encode()).hexdigest()
+            # 按日期变化的内容（今日提交数）在零点后视为已修改
+            last_modified = datetime.combine(today, time.min).astimezone(timezone.utc)
+            if updated_at:
+                last_modified = max(last_modified, updated_at.replace(tzinfo=timezone.utc))
+            
+            if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            else:
+                response = make_response('', 304)
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
 @app.route('/')
 def index():
     """首页重定向到登录页"""
@@ -52,7 +200,6 @@ def login():
         
         conn = get_db_connection()
         user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
         
         if user and check_password_hash(user['password'], password):
             user_obj = User(user['id'], user['username'], user['email'], user['name'], user['is_admin'])
@@ -72,41 +219,21 @@ def logout():
 
 @app.route('/dashboard')
 @login_required
+@conditional_view(per_user=True)
 def dashboard():
     """用户仪表盘"""
     today = date.today().strftime('%Y-%m-%d')
     
     conn = get_db_connection()
     # 获取今日提交的反馈数量
-    feedback_count = conn.execute(
-        'SELECT COUNT(*) as count FROM feedback WHERE user_id = ? AND DATE(created_at) = ?',
-        (current_user.id, today)
-    ).fetchone()['count']
+    feedback_count = get_daily_count(conn, current_user.id, today)
     
     # 获取最近的反馈记录
-    recent_feedback_raw = conn.execute(
+    recent_feedback = fetch_feedback(
+        conn,
         'SELECT * FROM feedback WHERE user_id = ? ORDER BY created_at DESC LIMIT 5',
         (current_user.id,)
-    ).fetchall()
-    
-    # 转换数据格式，处理datetime字段
-    recent_feedback = []
-    for feedback in recent_feedback_raw:
-        feedback_dict = dict(feedback)
-        # 将字符串格式的datetime转换为datetime对象
-        if feedback_dict['created_at']:
-            try:
-                feedback_dict['created_at'] = datetime.fromisoformat(feedback_dict['created_at'].replace('Z', '+00:00'))
-            except:
-                feedback_dict['created_at'] = datetime.strptime(feedback_dict['created_at'], '%Y-%m-%d %H:%M:%S')
-        if feedback_dict['updated_at']:
-            try:
-                feedback_dict['updated_at'] = datetime.fromisoformat(feedback_dict['updated_at'].replace('Z', '+00:00'))
-            except:
-                feedback_dict['updated_at'] = datetime.strptime(feedback_dict['updated_at'], '%Y-%m-%d %H:%M:%S')
-        recent_feedback.append(feedback_dict)
-    
-    conn.close()
+    )
     
     return render_template('dashboard.html', 
                          feedback_count=feedback_count, 
@@ -121,14 +248,10 @@ def submit_feedback():
         
         conn = get_db_connection()
         # 检查今日已提交数量
-        current_count = conn.execute(
-            'SELECT COUNT(*) as count FROM feedback WHERE user_id = ? AND DATE(created_at) = ?',
-            (current_user.id, today)
-        ).fetchone()['count']
+        current_count = get_daily_count(conn, current_user.id, today)
         
         if current_count >= 3:
             flash('今日已提交3个问题，无法继续提交')
-            conn.close()
             return redirect(url_for('dashboard'))
         
         content = request.form['content']
@@ -137,26 +260,35 @@ def submit_feedback():
         
         if not content.strip():
             flash('问题内容不能为空')
-            conn.close()
             return render_template('submit_feedback.html')
         
         if has_answer and not answer:
             flash('您选择了有答案，但未填写答案内容')
-            conn.close()
             return render_template('submit_feedback.html')
         
-        # 生成编号
-        sequence = current_count + 1
-        feedback_id = f"{today.replace('-', '')}-{current_user.username}-{sequence}"
-        
-        # 插入反馈记录
-        conn.execute(
-            'INSERT INTO feedback (id, user_id, content, has_answer, answer, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
-            (feedback_id, current_user.id, content, has_answer, answer, '新问题', datetime.now())
-        )
-        conn.commit()
-        conn.close()
+        # 原子地占用今日名额并分配编号，并发提交不会超过上限或生成重复编号
+        try:
+            sequence = reserve_daily_slot(conn, current_user.id, today, 3)
+            if sequence is None:
+                flash('今日已提交3个问题，无法继续提交')
+                return redirect(url_for('dashboard'))
+            
+            feedback_id = f"{today.replace('-', '')}-{current_user.username}-{sequence}"
+            
+            # 插入反馈记录
+            conn.execute(
+                'INSERT INTO feedback (id, user_id, content, has_answer, answer, status, created_at, submit_day) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (feedback_id, current_user.id, content, has_answer, answer, '新问题', datetime.now(), today)
+            )
+            publish_feedback_event(conn, 'created', feedback_id, current_user.id, '新问题')
+            publish_quota_event(conn, current_user.id, today)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         
+        fragment_cache.invalidate(*FEEDBACK_FRAGMENTS)
+        live_event_broker.wake()
         flash('问题提交成功')
         return redirect(url_for('dashboard'))
     
@@ -164,34 +296,21 @@ def submit_feedback():
 
 @app.route('/history')
 @login_required
+@conditional_view(per_user=True)
 def history():
     """历史反馈记录"""
     conn = get_db_connection()
-    feedback_list_raw = conn.execute(
-        'SELECT * FROM feedback WHERE user_id = ? ORDER BY created_at DESC',
-        (current_user.id,)
-    ).fetchall()
-    
-    # 转换数据格式，处理datetime字段
-    feedback_list = []
-    for feedback in feedback_list_raw:
-        feedback_dict = dict(feedback)
-        # 将字符串格式的datetime转换为datetime对象
-        if feedback_dict['created_at']:
-            try:
-                feedback_dict['created_at'] = datetime.fromisoformat(feedback_dict['created_at'].replace('Z', '+00:00'))
-            except:
-                feedback_dict['created_at'] = datetime.strptime(feedback_dict['created_at'], '%Y-%m-%d %H:%M:%S')
-        if feedback_dict['updated_at']:
-            try:
-                feedback_dict['updated_at'] = datetime.fromisoformat(feedback_dict['updated_at'].replace('Z', '+00:00'))
-            except:
-                feedback_dict['updated_at'] = datetime.strptime(feedback_dict['updated_at'], '%Y-%m-%d %H:%M:%S')
-        feedback_list.append(feedback_dict)
-    
-    conn.close()
-    
-    return render_template('history.html', feedback_list=feedback_list)
+    after, before, page_size = get_page_args()
+    page = fetch_feedback_page(
+        conn, 'SELECT * FROM feedback f', ['f.user_id = ?'], [current_user.id],
+        'created_at', after, before, page_size
+    )
+    status_counts = count_feedback_by_status(conn, current_user.id)
+    
+    return render_template('history.html',
+                         feedback_list=page.items,
+                         page=page,
+                         status_counts=status_counts)
 
 @app.route('/edit_user_feedback', methods=['POST'])
 @login_required
@@ -216,12 +335,10 @@ def edit_user_feedback():
     
     if not feedback:
         flash('问题不存在或无权限编辑')
-        conn.close()
         return redirect(url_for('history'))
     
     if feedback['status'] != '新问题':
         flash('只能编辑状态为"新问题"的问题')
-        conn.close()
         return redirect(url_for('history'))
     
     # 更新问题
@@ -231,16 +348,16 @@ def edit_user_feedback():
             SET content = ?, has_answer = ?, answer = ?, updated_at = CURRENT_TIMESTAMP
             WHERE id = ? AND user_id = ?
         ''', (content, has_answer, answer, feedback_id, current_user.id))
+        publish_feedback_event(conn, 'updated', feedback_id, current_user.id, feedback['status'])
         
         conn.commit()
+        fragment_cache.invalidate(*FEEDBACK_FRAGMENTS)
+        live_event_broker.wake()
         flash('问题修改成功')
         
     except Exception as e:
         conn.rollback()
         flash(f'修改失败: {str(e)}')
-        
-    finally:
-        conn.close()
     
     return redirect(url_for('history'))
 
@@ -254,129 +371,145 @@ def admin_panel():
     
     conn = get_db_connection()
     
-    # 获取所有用户今日提交状态
+    # 片段按数据版本缓存，命中时跳过对应的查询和渲染
+    versions, _ = get_data_versions(conn, ['feedback', 'users'])
     today = date.today().strftime('%Y-%m-%d')
-    users_status = conn.execute('''
-        SELECT u.id, u.username, u.email, u.backup_email, u.name,
-               COALESCE(f.feedback_count, 0) as feedback_count
-        FROM users u
-        LEFT JOIN (
-            SELECT user_id, COUNT(*) as feedback_count
-            FROM feedback
-            WHERE DATE(created_at) = ?
-            GROUP BY user_id
-        ) f ON u.id = f.user_id
-        WHERE u.is_admin = 0
-        ORDER BY u.name
-    ''', (today,)).fetchall()
-    
-    # 获取所有待处理的反馈
-    pending_feedback_raw = conn.execute(
-        'SELECT f.*, u.username, u.name FROM feedback f JOIN users u ON f.user_id = u.id WHERE f.status != "已解决" ORDER BY f.created_at DESC'
-    ).fetchall()
-    
-    # 获取所有已解决的反馈
-    resolved_feedback_raw = conn.execute(
-        'SELECT f.*, u.username, u.name FROM feedback f JOIN users u ON f.user_id = u.id WHERE f.status = "已解决" ORDER BY f.updated_at DESC'
-    ).fetchall()
-    
-    # 转换待处理反馈数据格式，处理datetime字段
-    pending_feedback = []
-    for feedback in pending_feedback_raw:
-        feedback_dict = dict(feedback)
-        # 将字符串格式的datetime转换为datetime对象
-        if feedback_dict['created_at']:
-            try:
-                feedback_dict['created_at'] = datetime.fromisoformat(feedback_dict['created_at'].replace('Z', '+00:00'))
-            except:
-                feedback_dict['created_at'] = datetime.strptime(feedback_dict['created_at'], '%Y-%m-%d %H:%M:%S')
-        if feedback_dict['updated_at']:
-            try:
-                feedback_dict['updated_at'] = datetime.fromisoformat(feedback_dict['updated_at'].replace('Z', '+00:00'))
-            except:
-                feedback_dict['updated_at'] = datetime.strptime(feedback_dict['updated_at'], '%Y-%m-%d %H:%M:%S')
-        pending_feedback.append(feedback_dict)
-    
-    # 转换已解决反馈数据格式，处理datetime字段
-    resolved_feedback = []
-    for feedback in resolved_feedback_raw:
-        feedback_dict = dict(feedback)
-        # 将字符串格式的datetime转换为datetime对象
-        if feedback_dict['created_at']:
-            try:
-                feedback_dict['created_at'] = datetime.fromisoformat(feedback_dict['created_at'].replace('Z', '+00:00'))
-            except:
-                feedback_dict['created_at'] = datetime.strptime(feedback_dict['created_at'], '%Y-%m-%d %H:%M:%S')
-        if feedback_dict['updated_at']:
-            try:
-                feedback_dict['updated_at'] = datetime.fromisoformat(feedback_dict['updated_at'].replace('Z', '+00:00'))
-            except:
-                feedback_dict['updated_at'] = datetime.strptime(feedback_dict['updated_at'], '%Y-%m-%d %H:%M:%S')
-        resolved_feedback.append(feedback_dict)
-    
-    conn.close()
+    
+    def render_users_status():
+        # 获取所有用户今日提交状态
+        users_status = conn.execute('''
+            SELECT u.id, u.username, u.email, u.backup_email, u.name,
+                   COALESCE(q.count, 0) as feedback_count
+            FROM users u
+            LEFT JOIN daily_quota q ON q.user_id = u.id AND q.day = ?
+            WHERE u.is_admin = 0
+            ORDER BY u.name
+        ''', (today,)).fetchall()
+        return render_template('_admin_users_status.html', users_status=users_status)
+    
+    feedback_query = 'SELECT f.*, u.username, u.name FROM feedback f JOIN users u ON f.user_id = u.id'
+    
+    def render_pending(after, before, page_size):
+        # 待处理的反馈（按提交时间分页）
+        pending_page = fetch_feedback_page(
+            conn, feedback_query, ["f.status != '已解决'"], [],
+            'created_at', after, before, page_size
+        )
+        return render_template('_admin_pending.html', pending_feedback=pending_page.items, pending_page=pending_page)
+    
+    def render_resolved(after, before, page_size):
+        # 已解决的反馈（按解决时间分页）
+        resolved_page = fetch_feedback_page(
+            conn, feedback_query, ["f.status = '已解决'"], [],
+            'updated_at', after, before, page_size
+        )
+        return render_template('_admin_resolved.html', resolved_feedback=resolved_page.items, resolved_page=resolved_page)
+    
+    pending_args = get_page_args('pending_')
+    resolved_args = get_page_args('resolved_')
+    users_status_html = fragment_cache.render('admin:users_status', (versions, today), render_users_status)
+    pending_html = fragment_cache.render('admin:pending', (versions, pending_args),
+                                         lambda: render_pending(*pending_args))
+    resolved_html = fragment_cache.render('admin:resolved', (versions, resolved_args),
+                                          lambda: render_resolved(*resolved_args))
+    
+    status_counts = get_feedback_stats(conn)
+    active_tab = 'resolved' if request.args.get('resolved_after') or request.args.get('resolved_before') else 'pending'
     
     return render_template('admin.html', 
-                         users_status=users_status, 
-                         pending_feedback=pending_feedback,
-                         resolved_feedback=resolved_feedback)
+                         users_status_html=users_status_html, 
+                         pending_html=pending_html,
+                         resolved_html=resolved_html,
+                         status_counts=status_counts,
+                         active_tab=active_tab)
 
 @app.route('/admin/export_resolved', methods=['GET'])
 @login_required
 def export_resolved_feedback():
-    """导出已解决问题为CSV格式"""
+    """流式导出问题为CSV格式（默认已解决问题）
+
+    筛选参数：status（默认已解决，all 为全部）、since/until（YYYY-MM-DD，已解决问题按解决时间，
+    其他按提交时间）、handler（处理人）；gzip=1 时输出 gzip 压缩文件。按 (时间, 编号) 键集
+    分批读取，边查询边发送，内存占用与总行数无关。
+    """
     if not current_user.is_admin:
         flash('权限不足', 'error')
         return redirect(url_for('dashboard'))
     
-    conn = get_db_connection()
+    try:
+        since, until = get_api_date_range()
+    except ApiArgumentError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('admin_panel'))
     
-    # 获取所有已解决的反馈，包含管理员修正的问题内容
-    resolved_feedback = conn.execute('''
-        SELECT f.id, f.content, f.revised_proposal, f.answer, f.updated_at, u.name
-        FROM feedback f 
-        JOIN users u ON f.user_id = u.id 
-        WHERE f.status = "已解决" 
-        ORDER BY f.updated_at DESC
-    ''').fetchall()
-    
-    conn.close()
-    
-    # 创建CSV内容
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # 写入标题行
-    writer.writerow(['序号', '问题', '答案', '时间'])
-    
-    # 写入数据行
-    for i, feedback in enumerate(resolved_feedback, 1):
-        # 使用管理员修正的问题内容，如果没有则使用原始内容
-        problem_content = feedback['revised_proposal'] if feedback['revised_proposal'] else feedback['content']
-        answer_content = feedback['answer'] if feedback['answer'] else '无答案'
-        
-        # 处理时间格式
-        if feedback['updated_at']:
-            try:
-                updated_time = datetime.fromisoformat(feedback['updated_at'].replace('Z', '+00:00'))
-                time_str = updated_time.strftime('%Y-%m-%d %H:%M:%S')
-            except:
-                try:
-                    updated_time = datetime.strptime(feedback['updated_at'], '%Y-%m-%d %H:%M:%S')
-                    time_str = updated_time.strftime('%Y-%m-%d %H:%M:%S')
-                except:
-                    time_str = feedback['updated_at']
-        else:
-            time_str = '未知时间'
+    status = request.args.get('status', '已解决')
+    sort_column = 'updated_at' if status == '已解决' else 'created_at'
+    conditions = []
+    params = []
+    if status != 'all':
+        conditions.append('f.status = ?')
+        params.append(status)
+    handler = request.args.get('handler', '').strip()
+    if handler:
+        conditions.append('f.handler = ?')
+        params.append(handler)
+    add_time_conditions(conditions, params, f'f.{sort_column}', since, until)
+    compress = request.args.get('gzip') in ('1', 'true')
+    chunk_size = app.config['EXPORT_CHUNK_SIZE']
+    
+    def generate_rows():
+        """逐批生成CSV文本；在请求结束后迭代，使用线程池化的数据库连接"""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        # 带BOM的UTF-8，Excel可直接识别中文
+        output.write('\ufeff')
+        writer.writerow(['序号', '问题', '答案', '时间'])
         
-        writer.writerow([i, problem_content, answer_content, time_str])
+        index = 0
+        cursor = None
+        while True:
+            with db_connection() as conn:
+                page = fetch_feedback_page(conn, '''
+                    SELECT f.id, f.content, f.revised_proposal, f.answer, f.created_at, f.updated_at, u.name
+                    FROM feedback f
+                    JOIN users u ON f.user_id = u.id
+                ''', conditions, params, sort_column, after=cursor, page_size=chunk_size)
+            
+            for feedback in page.items:
+                index += 1
+                # 使用管理员修正的问题内容，如果没有则使用原始内容
+                problem_content = feedback.revised_proposal if feedback.revised_proposal else feedback.content
+                answer_content = feedback.answer if feedback.answer else '无答案'
+                timestamp = getattr(feedback, sort_column)
+                time_str = timestamp.strftime('%Y-%m-%d %H:%M:%S') if timestamp else '未知时间'
+                writer.writerow([index, problem_content, answer_content, time_str])
+            
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+            
+            # 游标未前进时结束，避免重复输出同一批记录
+            if not page.next_cursor or page.next_cursor == cursor:
+                return
+            cursor = page.next_cursor
+    
+    def generate_gzip():
+        compressor = zlib.compressobj(wbits=31)
+        for text in generate_rows():
+            data = compressor.compress(text.encode('utf-8'))
+            if data:
+                yield data
+        yield compressor.flush()
     
-    # 创建响应
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv; charset=utf-8'
     # 使用英文文件名避免编码问题
     filename = f'resolved_issues_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    if compress:
+        response = app.response_class(generate_gzip(), mimetype='application/gzip')
+        filename += '.gz'
+    else:
+        response = app.response_class((text.encode('utf-8') for text in generate_rows()),
+                                      mimetype='text/csv')
+        response.headers['Content-Type'] = 'text/csv; charset=utf-8'
     response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
     
     return response
@@ -404,7 +537,6 @@ def update_feedback():
     
     if not original_feedback:
         flash('问题不存在')
-        conn.close()
         return redirect(url_for('admin_panel'))
     
     # 记录操作日志
@@ -443,38 +575,33 @@ def update_feedback():
         
         flash('问题状态更新成功')
     
-    conn.commit()
-    conn.close()
+    # 状态更新通知与修改在同一事务中写入发件箱，由后台投递线程发送
+    enqueue_status_update_notification(
+        conn,
+        feedback_id=feedback_id,
+        old_status=original_feedback['status'],
+        new_status=status,
+        admin_comment=admin_comment,
+        revised_proposal=revised_proposal if revised_proposal.strip() else '',
+        handler_name=current_user.name
+    )
+    publish_feedback_event(conn, 'updated', feedback_id, original_feedback['user_id'], status)
     
-    # 发送状态更新通知邮件
-    try:
-        from email_service import send_status_update_notification
-        send_status_update_notification(
-            feedback_id=feedback_id,
-            old_status=original_feedback['status'],
-            new_status=status,
-            admin_comment=admin_comment,
-            revised_proposal=revised_proposal if revised_proposal.strip() else '',
-            handler_name=current_user.name
-        )
-    except Exception as e:
-        print(f"邮件通知发送失败: {str(e)}")
-        # 邮件发送失败不影响主要功能，只记录错误
+    conn.commit()
+    fragment_cache.invalidate(*FEEDBACK_FRAGMENTS)
+    live_event_broker.wake()
     
     return redirect(url_for('admin_panel'))
 
 @app.route('/api/today_status')
 @login_required
+@conditional_view(per_user=True)
 def api_today_status():
     """API: 获取当前用户今日提交状态"""
     today = date.today().strftime('%Y-%m-%d')
     
     conn = get_db_connection()
-    feedback_count = conn.execute(
-        'SELECT COUNT(*) as count FROM feedback WHERE user_id = ? AND DATE(created_at) = ?',
-        (current_user.id, today)
-    ).fetchone()['count']
-    conn.close()
+    feedback_count = get_daily_count(conn, current_user.id, today)
     
     return jsonify({
         'success': True,
@@ -507,6 +634,7 @@ def send_manual_reminder_route():
 
 @app.route('/proposals')
 @login_required
+@conditional_view('feedback', 'users')
 def all_proposals():
     """所有问题页面 - 所有人可见"""
     conn = get_db_connection()
@@ -523,57 +651,45 @@ def all_proposals():
         where_conditions.append('f.status = ?')
         params.append(status_filter)
     
-    if search_query:
-        where_conditions.append('f.content LIKE ?')
-        params.append(f'%{search_query}%')
-    
-    where_clause = ' AND '.join(where_conditions)
-    if where_clause:
-        where_clause = 'WHERE ' + where_clause
-    
-    # 获取所有问题
-    proposals_raw = conn.execute(f'''
-        SELECT f.*, u.username, u.name,
-               handler_user.name as handler_name
-        FROM feedback f 
-        JOIN users u ON f.user_id = u.id
-        LEFT JOIN users handler_user ON f.handler = handler_user.name
-        {where_clause}
-        ORDER BY f.created_at DESC
-    ''', params).fetchall()
-    
-    # 转换数据格式，处理datetime字段
-    proposals = []
-    for proposal in proposals_raw:
-        proposal_dict = dict(proposal)
-        # 将字符串格式的datetime转换为datetime对象
-        if proposal_dict['created_at']:
-            try:
-                proposal_dict['created_at'] = datetime.fromisoformat(proposal_dict['created_at'].replace('Z', '+00:00'))
-            except:
-                proposal_dict['created_at'] = datetime.strptime(proposal_dict['created_at'], '%Y-%m-%d %H:%M:%S')
-        if proposal_dict['updated_at']:
-            try:
-                proposal_dict['updated_at'] = datetime.fromisoformat(proposal_dict['updated_at'].replace('Z', '+00:00'))
-            except:
-                proposal_dict['updated_at'] = datetime.strptime(proposal_dict['updated_at'], '%Y-%m-%d %H:%M:%S')
-        proposals.append(proposal_dict)
-    
-    # 获取统计信息
-    stats = conn.execute('''
-        SELECT 
-            COUNT(*) as total,
-            SUM(CASE WHEN status = '新问题' THEN 1 ELSE 0 END) as new_count,
-            SUM(CASE WHEN status = '处理中' THEN 1 ELSE 0 END) as processing_count,
-            SUM(CASE WHEN status = '已解决' THEN 1 ELSE 0 END) as resolved_count
-        FROM feedback
-    ''').fetchone()
-    
-    conn.close()
+    after, before, page_size = get_page_args()
+    
+    def render_proposals():
+        if search_query:
+            # 全文检索：按相关度排序并返回高亮摘要
+            page = search_feedback_page(conn, search_query, where_conditions, params, after, before, page_size)
+        else:
+            # 按提交时间分页获取问题
+            page = fetch_feedback_page(conn, '''
+                SELECT f.*, u.username, u.name,
+                       handler_user.name as handler_name
+                FROM feedback f 
+                JOIN users u ON f.user_id = u.id
+                LEFT JOIN users handler_user ON f.handler = handler_user.name
+            ''', where_conditions, params, 'created_at', after, before, page_size)
+        return render_template('_proposals_list.html',
+                               proposals=page.items,
+                               page=page,
+                               current_status=status_filter,
+                               search_query=search_query)
+    
+    # 问题列表按数据版本和筛选/分页参数缓存
+    versions, _ = get_data_versions(conn, ['feedback', 'users'])
+    proposals_html = fragment_cache.render(
+        'proposals:list', (versions, status_filter, search_query, after, before, page_size), render_proposals
+    )
+    
+    # 获取统计信息（读取触发器维护的计数，无需扫描反馈表）
+    status_counts = get_feedback_stats(conn)
+    stats = {
+        'total': status_counts['total'],
+        'new_count': status_counts.get('新问题', 0),
+        'processing_count': status_counts.get('处理中', 0),
+        'resolved_count': status_counts.get('已解决', 0)
+    }
     
     return render_template('proposals.html', 
-                         proposals=proposals, 
-                         stats=dict(stats),
+                         proposals_html=proposals_html,
+                         stats=stats,
                          current_status=status_filter,
                          search_query=search_query)
 
@@ -589,32 +705,81 @@ def notification_logs():
     
     conn = get_db_connection()
     
-    # 获取通知日志
-    logs = conn.execute('''
-        SELECT nl.*, u.name as user_name
-        FROM notification_logs nl
-        LEFT JOIN users u ON nl.user_id = u.id
-        ORDER BY nl.sent_at DESC
-        LIMIT 500
-    ''').fetchall()
+    # 统计信息单次扫描获取，明细由页面通过 /api/notification_logs 分批加载
+    stats = get_notification_stats(conn)
+    outbox_counts = get_outbox_counts(conn)
     
-    # 获取统计信息
-    total_notifications = conn.execute('SELECT COUNT(*) as count FROM notification_logs').fetchone()['count']
-    success_notifications = conn.execute('SELECT COUNT(*) as count FROM notification_logs WHERE status = "成功"').fetchone()['count']
-    failed_notifications = conn.execute('SELECT COUNT(*) as count FROM notification_logs WHERE status = "失败"').fetchone()['count']
-    today_notifications = conn.execute('''
-        SELECT COUNT(*) as count FROM notification_logs 
-        WHERE date(sent_at) = date('now')
-    ''').fetchone()['count']
+    return render_template('notification_logs.html',
+                         total_notifications=stats['total'],
+                         success_notifications=stats['success'],
+                         failed_notifications=stats['failed'],
+                         today_notifications=stats['today'],
+                         pending_count=outbox_counts.get(OUTBOX_PENDING, 0),
+                         dead_letter_count=outbox_counts.get(OUTBOX_DEAD, 0))
+
+@app.route('/job_runs')
+@login_required
+def job_runs():
+    """定时任务执行记录页面（仅管理员可访问）"""
+    if not current_user.is_admin:
+        flash('您没有权限访问此页面', 'error')
+        return redirect(url_for('dashboard'))
     
-    conn.close()
+    conn = get_db_connection()
+    job_id = request.args.get('job_id', '').strip() or None
+    overview = get_job_run_overview(conn)
+    scheduled = get_scheduled_jobs(conn, JOB_MISFIRE_GRACE_SECONDS)
+    for item in overview:
+        item['sparkline'] = sparkline_points(item['trend'])
+        item.update(scheduled.get(item['job_id'], {'next_run_time': None, 'overdue': False}))
+    # 已登记但尚无执行记录的任务
+    recorded = {item['job_id'] for item in overview}
+    for scheduled_id, info in scheduled.items():
+        if scheduled_id not in recorded:
+            overview.append(dict(job_id=scheduled_id, runs=0, last=None, trend=[], sparkline='', **info))
+    
+    return render_template('job_runs.html',
+                         overview=overview,
+                         runs=get_job_runs(conn, job_id),
+                         current_job=job_id)
+
+@app.route('/api/notification_logs')
+@login_required
+def api_notification_logs():
+    """通知日志明细分页API，支持状态、类型、日期和关键字筛选"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': '权限不足'})
     
-    return render_template('notification_logs.html',
-                         notification_logs=[dict(log) for log in logs],
-                         total_notifications=total_notifications,
-                         success_notifications=success_notifications,
-                         failed_notifications=failed_notifications,
-                         today_notifications=today_notifications)
+    conditions = []
+    params = []
+    since = until = None
+    status = request.args.get('status', 'all')
+    if status != 'all':
+        conditions.append('nl.status = ?')
+        params.append(status)
+    notification_type = request.args.get('type', 'all')
+    if notification_type != 'all':
+        conditions.append('nl.notification_type = ?')
+        params.append(notification_type)
+    day = request.args.get('date', '').strip()
+    if day:
+        try:
+            since, until = day_range(datetime.strptime(day, '%Y-%m-%d').date())
+            conditions.append('nl.sent_at >= ? AND nl.sent_at < ?')
+            params.extend([since, until])
+        except ValueError:
+            return jsonify({'success': False, 'message': '日期格式错误'})
+    keyword = request.args.get('q', '').strip()
+    if keyword:
+        conditions.append('(nl.email LIKE ? OR CAST(nl.feedback_id AS TEXT) LIKE ?)')
+        params.extend([f'%{keyword}%', f'%{keyword}%'])
+    
+    after, _, page_size = get_page_args()
+    conn = get_db_connection()
+    page = fetch_notification_logs_page(conn, conditions, params, after=after, page_size=page_size)
+    page = extend_with_archived_logs(page, 'notification_logs', 'nl', conditions, params,
+                                     after, page_size, since, until)
+    return jsonify({'success': True, 'logs': page.items, 'next_cursor': page.next_cursor})
 
 @app.route('/api/notification_log/<int:log_id>')
 @login_required
@@ -630,94 +795,188 @@ def get_notification_log(log_id):
         LEFT JOIN users u ON nl.user_id = u.id
         WHERE nl.id = ?
     ''', (log_id,)).fetchone()
-    conn.close()
     
     if log:
         return jsonify({'success': True, 'log': dict(log)})
-    else:
-        return jsonify({'success': False, 'message': '日志不存在'})
+    
+    # 热库中没有时到归档中查找
+    archived = log_archiver.find_archived_record('notification_logs', log_id)
+    if archived:
+        attach_user_names(conn, 'notification_logs', [archived])
+        return jsonify({'success': True, 'log': archived})
+    return jsonify({'success': False, 'message': '日志不存在'})
 
-@app.route('/api/resend_notification/<int:feedback_id>', methods=['POST'])
+@app.route('/api/resend_notification/<feedback_id>', methods=['POST'])
 @login_required
 def resend_notification(feedback_id):
-    """重新发送通知API"""
+    """重新发送通知API：优先重新投递该问题的死信，否则按当前状态重新生成状态更新通知"""
     if not current_user.is_admin:
         return jsonify({'success': False, 'message': '权限不足'})
     
     try:
         conn = get_db_connection()
         
-        # 获取问题信息
-        feedback = conn.execute('''
-            SELECT f.*, u.email, u.name as user_name
-            FROM feedback f
-            JOIN users u ON f.user_id = u.id
-            WHERE f.id = ?
-        ''', (feedback_id,)).fetchone()
-        
-        if not feedback:
-            conn.close()
-            return jsonify({'success': False, 'message': '问题不存在'})
-        
-        # 获取最新的状态更新记录
-        latest_log = conn.execute('''
-            SELECT * FROM operation_logs 
-            WHERE feedback_id = ? AND action LIKE '%状态更新%'
-            ORDER BY created_at DESC LIMIT 1
-        ''', (feedback_id,)).fetchone()
-        
-        conn.close()
-        
-        # 重新发送通知
-        from email_service import send_status_update_notification
-        
-        old_status = latest_log['details'].split('→')[0].strip() if latest_log and '→' in latest_log['details'] else '未知'
-        new_status = feedback['status']
-        
-        send_status_update_notification(
-            feedback_id=feedback_id,
-            user_id=feedback['user_id'],
-            user_email=feedback['email'],
-            old_status=old_status,
-            new_status=new_status,
-            handler_name=current_user.name,
-            admin_comment=feedback.get('admin_comment', ''),
-            corrected_proposal=feedback.get('corrected_proposal', '')
-        )
+        dead_letter = conn.execute('''
+            SELECT id FROM email_outbox
+            WHERE feedback_id = ? AND status = ?
+            ORDER BY id DESC LIMIT 1
+        ''', (feedback_id, OUTBOX_DEAD)).fetchone()
+        if dead_letter:
+            requeue_dead_letters(conn, [dead_letter['id']])
+        else:
+            feedback = conn.execute('SELECT * FROM feedback WHERE id = ?', (feedback_id,)).fetchone()
+            if not feedback:
+                return jsonify({'success': False, 'message': '问题不存在'})
+            
+            # 最近一次状态变更的原状态
+            latest_log = conn.execute('''
+                SELECT old_status FROM operation_logs
+                WHERE feedback_id = ? AND operation_type IN ('状态更新', '修正问题')
+                ORDER BY created_at DESC, id DESC LIMIT 1
+            ''', (feedback_id,)).fetchone()
+            
+            enqueue_status_update_notification(
+                conn,
+                feedback_id=feedback_id,
+                old_status=latest_log['old_status'] if latest_log and latest_log['old_status'] else '未知',
+                new_status=feedback['status'],
+                admin_comment=feedback['admin_comment'] or '',
+                revised_proposal=feedback['revised_proposal'] or '',
+                handler_name=current_user.name
+            )
         
-        return jsonify({'success': True, 'message': '通知邮件重新发送成功'})
+        conn.commit()
+        return jsonify({'success': True, 'message': '通知邮件已重新加入发送队列'})
         
     except Exception as e:
         return jsonify({'success': False, 'message': f'重新发送失败: {str(e)}'})
 
+@app.route('/api/dead_letters')
+@login_required
+def api_dead_letters():
+    """死信列表API：永久性错误或重试次数用尽的通知邮件"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': '权限不足'})
+    
+    conn = get_db_connection()
+    return jsonify({'success': True, 'dead_letters': get_dead_letters(conn)})
+
+@app.route('/api/fragment_cache')
+@login_required
+def api_fragment_cache():
+    """片段缓存统计API：命中率、占用内存和淘汰次数"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': '权限不足'})
+    
+    return jsonify({'success': True, 'stats': fragment_cache.stats()})
+
+@app.route('/api/live_events')
+@login_required
+def api_live_events():
+    """实时事件流（Server-Sent Events）：管理员收到全部反馈事件，普通用户只收到自己的"""
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    except (TypeError, ValueError):
+        last_event_id = None
+    user_id = None if current_user.is_admin else current_user.id
+    
+    response = app.response_class(live_event_broker.stream(last_event_id, user_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭反向代理缓冲，事件立即送达
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/live_row/<kind>/<key>')
+@login_required
+def api_live_row(kind, key):
+    """收到实时事件后获取受影响行的最新HTML，与页面使用同一个行宏；记录已不存在时 html 为 null
+
+    kind: feedback（view=admin 时返回所在列表 pending/resolved，view=dashboard 为本人的最近问题行）、
+    user_status（管理员面板的用户卡片，key 为用户ID）、today_status（本人今日提交状态）。
+    """
+    conn = get_db_connection()
+    today = date.today().strftime('%Y-%m-%d')
+    
+    if kind == 'feedback' and request.args.get('view') == 'admin':
+        if not current_user.is_admin:
+            return jsonify({'success': False, 'message': '权限不足'}), 403
+        records = fetch_feedback(conn, '''
+            SELECT f.*, u.username, u.name FROM feedback f JOIN users u ON f.user_id = u.id
+            WHERE f.id = ?
+        ''', (key,))
+        if not records:
+            return jsonify({'success': True, 'html': None})
+        feedback = records[0]
+        target = 'resolved' if feedback.status == '已解决' else 'pending'
+        macro = get_template_attribute('_feedback_rows.html', f'{target}_row')
+        return jsonify({'success': True, 'list': target, 'html': str(macro(feedback))})
+    
+    if kind == 'feedback':
+        records = fetch_feedback(conn, 'SELECT * FROM feedback WHERE id = ? AND user_id = ?', (key, current_user.id))
+        if not records:
+            return jsonify({'success': True, 'html': None})
+        macro = get_template_attribute('_feedback_rows.html', 'dashboard_row')
+        return jsonify({'success': True, 'html': str(macro(records[0]))})
+    
+    if kind == 'user_status':
+        if not current_user.is_admin:
+            return jsonify({'success': False, 'message': '权限不足'}), 403
+        user = conn.execute('''
+            SELECT u.id, u.username, u.email, u.backup_email, u.name,
+                   COALESCE(q.count, 0) as feedback_count
+            FROM users u
+            LEFT JOIN daily_quota q ON q.user_id = u.id AND q.day = ?
+            WHERE u.id = ? AND u.is_admin = 0
+        ''', (today, key)).fetchone()
+        if not user:
+            return jsonify({'success': True, 'html': None})
+        macro = get_template_attribute('_feedback_rows.html', 'user_status_card')
+        return jsonify({'success': True, 'html': str(macro(user))})
+    
+    if kind == 'today_status':
+        macro = get_template_attribute('_feedback_rows.html', 'today_status')
+        return jsonify({'success': True, 'html': str(macro(get_daily_count(conn, current_user.id, today)))})
+    
+    return jsonify({'success': False, 'message': '未知类型'}), 404
+
+@app.route('/api/dead_letters/requeue', methods=['POST'])
+@login_required
+def requeue_dead_letters_api():
+    """重新投递死信API，未指定 ids 时重新投递全部死信"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': '权限不足'})
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        outbox_ids = [int(outbox_id) for outbox_id in data.get('ids') or []]
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': '参数错误'})
+    
+    conn = get_db_connection()
+    count = requeue_dead_letters(conn, outbox_ids)
+    conn.commit()
+    return jsonify({'success': True, 'requeued_count': count})
+
 @app.route('/api/clear_old_logs', methods=['POST'])
 @login_required
 def clear_old_logs():
-    """清理旧日志API"""
+    """归档旧日志API"""
     if not current_user.is_admin:
         return jsonify({'success': False, 'message': '权限不足'})
     
     try:
-        conn = get_db_connection()
-        
-        # 删除30天前的日志
-        result = conn.execute('''
-            DELETE FROM notification_logs 
-            WHERE date(sent_at) < date('now', '-30 days')
-        ''')
-        
-        deleted_count = result.rowcount
-        conn.commit()
-        conn.close()
+        # 30天前的通知日志移入按月归档库，仍可在通知日志页面中查到
+        summary = log_archiver.archive_old_logs(retention_days=30, tables=['notification_logs'])
+        archived_count = summary['tables']['notification_logs']
         
         return jsonify({
             'success': True, 
-            'message': f'成功清理了 {deleted_count} 条旧日志',
-            'deleted_count': deleted_count
+            'message': f'成功归档了 {archived_count} 条旧日志',
+            'deleted_count': archived_count
         })
         
     except Exception as e:
-        return jsonify({'success': False, 'message': f'清理失败: {str(e)}'})
+        return jsonify({'success': False, 'message': f'归档失败: {str(e)}'})
 
 @app.route('/api/delete_feedback/<feedback_id>', methods=['DELETE'])
 @login_required
@@ -738,7 +997,6 @@ def delete_feedback(feedback_id):
         ''', (feedback_id,)).fetchone()
         
         if not feedback:
-            conn.close()
             return jsonify({'success': False, 'message': '问题不存在'})
         
         # 获取删除原因（可选参数）
@@ -758,67 +1016,26 @@ def delete_feedback(feedback_id):
         # 删除相关的通知日志
         conn.execute('DELETE FROM notification_logs WHERE feedback_id = ?', (feedback_id,))
         
-        # 删除问题
+        # 删除问题并归还对应日期的提交名额
         conn.execute('DELETE FROM feedback WHERE id = ?', (feedback_id,))
+        release_daily_slot(conn, feedback['user_id'], feedback['submit_day'])
         
-        conn.commit()
-        conn.close()
+        # 删除通知与删除操作在同一事务中写入发件箱，由后台投递线程发送
+        enqueue_deletion_notification(
+            conn,
+            feedback_id=feedback_id,
+            user_id=feedback['user_id'],
+            username=feedback['name'] or feedback['username'],
+            feedback_content=feedback['content'],
+            admin_name=current_user.name,
+            deletion_reason=deletion_reason
+        )
+        publish_feedback_event(conn, 'deleted', feedback_id, feedback['user_id'])
+        publish_quota_event(conn, feedback['user_id'], feedback['submit_day'])
         
-        # 发送删除通知邮件
-        try:
-            from email_service import send_deletion_notification_email, get_user_email_for_sending
-            
-            # 获取要发送的邮箱地址（交替使用主邮箱和备份邮箱）
-            target_email = get_user_email_for_sending(feedback['user_id'])
-            if target_email:
-                send_deletion_notification_email(
-                    recipient_email=target_email,
-                    username=feedback['name'] or feedback['username'],
-                    feedback_content=feedback['content'],
-                    admin_name=current_user.name,
-                    deletion_reason=deletion_reason
-                )
-                
-                # 记录邮件发送日志
-                conn = get_db_connection()
-                conn.execute('''
-                    INSERT INTO notification_logs (user_id, feedback_id, email, notification_type, status, error_message)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    feedback['user_id'],
-                    feedback_id,
-                    target_email,
-                    'delete_notification',
-                    '成功',
-                    None
-                ))
-                conn.commit()
-                conn.close()
-                
-                print(f"✅ [删除通知] 已向用户 {feedback['username']} 发送删除通知邮件")
-            else:
-                print(f"⚠️ [删除通知] 用户 {feedback['username']} 没有有效邮箱地址")
-                
-        except Exception as email_error:
-            print(f"❌ [删除通知] 发送邮件失败: {str(email_error)}")
-            # 记录邮件发送失败日志
-            try:
-                conn = get_db_connection()
-                conn.execute('''
-                    INSERT INTO notification_logs (user_id, feedback_id, email, notification_type, status, error_message)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    feedback['user_id'],
-                    feedback_id,
-                    feedback['email'],
-                    'delete_notification',
-                    '失败',
-                    str(email_error)
-                ))
-                conn.commit()
-                conn.close()
-            except:
-                pass
+        conn.commit()
+        fragment_cache.invalidate(*FEEDBACK_FRAGMENTS)
+        live_event_broker.wake()
         
         return jsonify({
             'success': True, 
@@ -828,34 +1045,215 @@ def delete_feedback(feedback_id):
     except Exception as e:
         return jsonify({'success': False, 'message': f'删除失败: {str(e)}'})
 
-if __name__ == '__main__':
-    # 初始化数据库
-    init_db()
+# ---------- /api/v1：分页JSON只读接口 ----------
+
+# 各资源可返回的字段，fields 参数从中选择（逗号分隔），未指定时返回全部
+API_V1_FIELDS = {
+    'feedback': ('id', 'user_id', 'username', 'name', 'content', 'has_answer', 'answer', 'status',
+                 'revised_proposal', 'admin_comment', 'handler', 'created_at', 'updated_at', 'submit_day'),
+    'users_status': ('id', 'username', 'email', 'backup_email', 'name', 'feedback_count'),
+    'notification_logs': ('id', 'feedback_id', 'user_id', 'user_name', 'email', 'notification_type',
+                          'old_status', 'new_status', 'status', 'error_message', 'sent_at', 'handler_name'),
+    'operation_logs': ('id', 'feedback_id', 'operator_id', 'operator_name', 'operation_type', 'old_content',
+                       'new_content', 'old_status', 'new_status', 'comment', 'created_at'),
+}
+
+class ApiArgumentError(ValueError):
+    """/api/v1 查询参数错误，返回400"""
+
+def get_api_fields(resource: str) -> list:
+    """读取 fields 参数，未知字段抛出 ApiArgumentError"""
+    allowed = API_V1_FIELDS[resource]
+    fields = [name.strip() for name in request.args.get('fields', '').split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ApiArgumentError(f"未知字段: {', '.join(unknown)}，可选: {', '.join(allowed)}")
+    return fields or list(allowed)
+
+def get_api_int(name: str):
+    """读取整数参数（如 user），未提供时返回None"""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiArgumentError(f'参数 {name} 应为整数')
+
+def get_api_date_range():
+    """读取 since/until（YYYY-MM-DD，均含当天），返回 [since 零点, until 次日零点) 的时间范围"""
+    bounds = []
+    for name, index in (('since', 0), ('until', 1)):
+        value = request.args.get(name, '').strip()
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            bounds.append(day_range(datetime.strptime(value, '%Y-%m-%d').date())[index])
+        except ValueError:
+            raise ApiArgumentError(f'参数 {name} 日期格式应为 YYYY-MM-DD')
+    return tuple(bounds)
+
+def add_time_conditions(conditions: list, params: list, column: str, since, until):
+    """按时间范围追加筛选条件"""
+    if since:
+        conditions.append(f'{column} >= ?')
+        params.append(since)
+    if until:
+        conditions.append(f'{column} < ?')
+        params.append(until)
+
+def api_page_response(page: Page, fields: list):
+    """按所选字段输出一页数据
+
+    默认 data 为对象列表；compact=1 时只输出一次字段名，rows 为按 fields 顺序排列的数组，
+    且不含空白、中文不转义，适合脚本批量拉取。
+    """
+    rows = [
+        [item.get(name) if isinstance(item, dict) else getattr(item, name) for name in fields]
+        for item in page.items
+    ]
+    payload = {'success': True, 'next_cursor': page.next_cursor, 'prev_cursor': page.prev_cursor}
+    if request.args.get('compact') in ('1', 'true'):
+        payload.update(fields=fields, rows=rows)
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=JSONProvider.default)
+        return app.response_class(body, mimetype='application/json')
+    payload['data'] = [dict(zip(fields, row)) for row in rows]
+    return jsonify(payload)
+
+@app.errorhandler(ApiArgumentError)
+def handle_api_argument_error(e):
+    return jsonify({'success': False, 'message': str(e)}), 400
+
+@app.route('/api/v1/feedback')
+@login_required
+@conditional_view('feedback', 'users')
+def api_v1_feedback():
+    """API v1：反馈列表（与问题列表页相同，所有登录用户可读）
+
+    筛选：status、user（提交人ID）、since/until（提交日期）；按提交时间倒序，
+    after/before 游标翻页。
+    """
+    fields = get_api_fields('feedback')
+    user_id = get_api_int('user')
+    since, until = get_api_date_range()
+    conditions = []
+    params = []
+    status = request.args.get('status', 'all')
+    if status != 'all':
+        conditions.append('f.status = ?')
+        params.append(status)
+    if user_id is not None:
+        conditions.append('f.user_id = ?')
+        params.append(user_id)
+    add_time_conditions(conditions, params, 'f.created_at', since, until)
+    
+    after, before, page_size = get_page_args()
+    page = fetch_feedback_page(
+        get_db_connection(),
+        'SELECT f.*, u.username, u.name FROM feedback f JOIN users u ON f.user_id = u.id',
+        conditions, params, 'created_at', after, before, page_size
+    )
+    return api_page_response(page, fields)
+
+@app.route('/api/v1/users_status')
+@login_required
+@conditional_view('users', 'feedback')
+def api_v1_users_status():
+    """API v1：普通用户及其某日（date，默认今天）的提交数量，仅管理员；按姓名排序"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': '权限不足'}), 403
     
-    # 设置定时任务 - 每天4点和6点发送提醒
-    scheduler = BackgroundScheduler()
+    fields = get_api_fields('users_status')
+    user_id = get_api_int('user')
+    day = request.args.get('date', '').strip() or date.today().strftime('%Y-%m-%d')
+    try:
+        datetime.strptime(day, '%Y-%m-%d')
+    except ValueError:
+        raise ApiArgumentError('参数 date 日期格式应为 YYYY-MM-DD')
+    conditions = []
+    params = []
+    if user_id is not None:
+        conditions.append('u.id = ?')
+        params.append(user_id)
     
-    # 早上4点提醒
-    scheduler.add_job(
-        func=check_and_send_reminders,
-        trigger="cron",
-        hour=16,
-        minute=0,
-        id='morning_reminder_4pm'
-    )
+    after, _, page_size = get_page_args()
+    page = fetch_users_status_page(get_db_connection(), day, conditions, params, after, page_size)
+    return api_page_response(page, fields)
+
+@app.route('/api/v1/notification_logs')
+@login_required
+@conditional_view('notification_logs', 'users')
+def api_v1_notification_logs():
+    """API v1：通知日志，仅管理员；筛选 status、type、user、feedback、since/until，热库读完后续读归档"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': '权限不足'}), 403
     
-    # 早上6点提醒
-    scheduler.add_job(
-        func=check_and_send_reminders,
-        trigger="cron",
-        hour=18,
-        minute=0,
-        id='morning_reminder_6pm'
-    )
+    fields = get_api_fields('notification_logs')
+    user_id = get_api_int('user')
+    since, until = get_api_date_range()
+    conditions = []
+    params = []
+    for name, column in (('status', 'nl.status'), ('type', 'nl.notification_type'), ('feedback', 'nl.feedback_id')):
+        value = request.args.get(name, '').strip()
+        if value and value != 'all':
+            conditions.append(f'{column} = ?')
+            params.append(value)
+    if user_id is not None:
+        conditions.append('nl.user_id = ?')
+        params.append(user_id)
+    add_time_conditions(conditions, params, 'nl.sent_at', since, until)
+    
+    after, _, page_size = get_page_args()
+    page = fetch_notification_logs_page(get_db_connection(), conditions, params, after, page_size)
+    page = extend_with_archived_logs(page, 'notification_logs', 'nl', conditions, params,
+                                     after, page_size, since, until)
+    return api_page_response(page, fields)
+
+@app.route('/api/v1/operation_logs')
+@login_required
+@conditional_view('feedback', 'users')
+def api_v1_operation_logs():
+    """API v1：操作日志，仅管理员；筛选 type、user（操作人ID）、feedback、since/until，热库读完后续读归档"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': '权限不足'}), 403
     
-    scheduler.start()
+    fields = get_api_fields('operation_logs')
+    user_id = get_api_int('user')
+    since, until = get_api_date_range()
+    conditions = []
+    params = []
+    for name, column in (('type', 'ol.operation_type'), ('feedback', 'ol.feedback_id')):
+        value = request.args.get(name, '').strip()
+        if value and value != 'all':
+            conditions.append(f'{column} = ?')
+            params.append(value)
+    if user_id is not None:
+        conditions.append('ol.operator_id = ?')
+        params.append(user_id)
+    add_time_conditions(conditions, params, 'ol.created_at', since, until)
+    
+    after, _, page_size = get_page_args()
+    page = fetch_operation_logs_page(get_db_connection(), conditions, params, after, page_size)
+    page = extend_with_archived_logs(page, 'operation_logs', 'ol', conditions, params,
+                                     after, page_size, since, until)
+    return api_page_response(page, fields)
+
+if __name__ == '__main__':
+    # 初始化数据库
+    init_db()
+    
+    # 定时任务和发件箱投递由独立进程 scheduler_worker.py 运行，Web进程只处理请求；
+    # 单进程开发时可设置 EMBEDDED_WORKER=1 在本进程内一并运行（只在重载器的服务子进程中启动，
+    # 避免两个调度器共用同一任务存储）
+    worker = None
+    if os.getenv('EMBEDDED_WORKER') == '1' and os.getenv('WERKZEUG_RUN_MAIN') == 'true':
+        from scheduler_worker import SchedulerWorker
+        worker = SchedulerWorker()
+        worker.start()
     
     try:
         app.run(debug=True, host='0.0.0.0', port=5008)
-    except (KeyboardInterrupt, SystemExit):
-        scheduler.shutdown()
\ No newline at end of file
+    finally:
+        if worker:
+            worker.stop()
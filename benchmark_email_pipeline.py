@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+邮件发送链路基准
+在本地启动一个 asyncio 实现的简易SMTP服务器，分别驱动提醒邮件（check_and_send_reminders）
+和状态更新通知（发件箱投递）两条链路，输出每秒发送封数及 p50/p95/p99 单封发送耗时，
+并核对发送成功封数与服务器（或内存/目录传输）实际收到的封数一致，不一致时以非零状态退出
+
+使用方法：
+  python benchmark_email_pipeline.py                         # 默认 200 个用户、200 条通知
+  python benchmark_email_pipeline.py 1000 --latency 20       # SMTP服务器每封模拟20ms处理延迟
+  python benchmark_email_pipeline.py 500 --transport memory  # 对比内存传输
+  python benchmark_email_pipeline.py 200 --rate 600          # 按每分钟600封限速
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import date
+from typing import List
+
+class StandInSMTPServer:
+    """asyncio 实现的最小SMTP服务器：接受任意认证和投递，可模拟每封邮件的处理延迟"""
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.received = 0
+        self.port = None
+        self._loop = None
+
+    async def handle(self, reader, writer):
+        writer.write(b'220 stand-in ESMTP\r\n')
+        await writer.drain()
+        in_data = False
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if in_data:
+                if line == b'.\r\n':
+                    in_data = False
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    self.received += 1
+                    writer.write(b'250 2.0.0 OK queued\r\n')
+                    await writer.drain()
+                continue
+
+            command = line[:4].upper()
+            if command == b'EHLO':
+                writer.write(b'250-stand-in\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n')
+            elif command == b'AUTH':
+                writer.write(b'235 2.7.0 Authentication successful\r\n')
+            elif command == b'DATA':
+                in_data = True
+                writer.write(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+            elif command == b'QUIT':
+                writer.write(b'221 2.0.0 Bye\r\n')
+                await writer.drain()
+                break
+            else:
+                # HELO / MAIL / RCPT / RSET / NOOP
+                writer.write(b'250 2.0.0 OK\r\n')
+            await writer.drain()
+        writer.close()
+
+    def start(self) -> int:
+        """在后台线程中启动服务器，返回监听端口"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            server = self._loop.run_until_complete(asyncio.start_server(self.handle, '127.0.0.1', 0))
+            self.port = server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, name='smtp-stand-in', daemon=True).start()
+        ready.wait()
+        return self.port
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+def percentile(samples: List[float], pct: float) -> float:
+    """最近秩法百分位数"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def instrument(transport, samples: List[float]):
+    """记录传输层每封邮件的发送耗时"""
+    original = transport.send
+
+    def timed_send(*args):
+        start = time.perf_counter()
+        original(*args)
+        samples.append(time.perf_counter() - start)
+
+    transport.send = timed_send
+
+def prepare_data(conn, count: int):
+    """生成 count 个待提醒的用户，每人一条待更新状态的反馈"""
+    today = date.today().strftime('%Y-%m-%d')
+    conn.executemany(
+        'INSERT INTO users (username, password, email, name) VALUES (?, ?, ?, ?)',
+        [(f'bench{i}', 'x', f'bench{i}@example.com', f'基准用户{i}') for i in range(count)]
+    )
+    rows = conn.execute("SELECT id, username FROM users WHERE username LIKE 'bench%'").fetchall()
+    conn.executemany(
+        'INSERT INTO feedback (id, user_id, content, status, submit_day) VALUES (?, ?, ?, ?, ?)',
+        [(f'{today}-{row["username"]}-1', row['id'], f'基准问题内容 {row["username"]}', '新问题', today)
+         for row in rows]
+    )
+    conn.commit()
+    return [f'{today}-{row["username"]}-1' for row in rows]
+
+def received_count(transport, server: StandInSMTPServer, spool_dir: str) -> int:
+    """传输另一端实际收到的邮件封数"""
+    if transport.name == 'memory':
+        return len(transport.messages)
+    if transport.name == 'spool':
+        return len(os.listdir(os.path.join(spool_dir, 'new')))
+    return server.received
+
+def report(name: str, samples: List[float], elapsed: float):
+    ms = [sample * 1000 for sample in samples]
+    rate = len(samples) / elapsed if elapsed else 0
+    print(f"{name:<12} {len(samples):>6} {elapsed:>9.2f} {rate:>10.1f} "
+          f"{percentile(ms, 50):>9.2f} {percentile(ms, 95):>9.2f} {percentile(ms, 99):>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='邮件发送链路基准')
+    parser.add_argument('count', nargs='?', type=int, default=200, help='用户数及通知数')
+    parser.add_argument('--latency', type=float, default=0, help='SMTP服务器每封模拟处理延迟（毫秒）')
+    parser.add_argument('--transport', choices=['smtp', 'memory', 'spool'], default='smtp')
+    parser.add_argument('--rate', type=float, default=0, help='提醒限速（每分钟封数，0为不限速）')
+    parser.add_argument('--workers', type=int, default=4, help='提醒并发线程数及SMTP连接池大小')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ok = run(args, tmpdir)
+    if not ok:
+        sys.exit(1)
+
+def run(args, tmpdir: str) -> bool:
+    """在临时目录中执行基准，返回发送与接收封数是否一致"""
+    server = StandInSMTPServer(args.latency)
+    port = server.start()
+
+    # 配置需在导入数据库和邮件模块之前写入环境变量
+    os.environ.update({
+        'DATABASE_PATH': os.path.join(tmpdir, 'benchmark.db'),
+        'MAIL_TRANSPORT': args.transport,
+        'MAIL_SPOOL_DIR': os.path.join(tmpdir, 'spool'),
+        'SMTP_SERVER': '127.0.0.1',
+        'SMTP_PORT': str(port),
+        'SMTP_USE_SSL': '0',
+        'SMTP_POOL_SIZE': str(args.workers),
+        'REMINDER_WORKERS': str(args.workers),
+        'REMINDER_RATE_PER_MINUTE': str(args.rate),
+        'DIGEST_WINDOW_SECONDS': '0',
+    })
+    from database import init_db, db_connection, db_manager
+    from email_service import email_service, check_and_send_reminders
+    from email_outbox import outbox_worker, enqueue_status_update_notification
+
+    try:
+        init_db()
+        logging.getLogger().setLevel(logging.WARNING)
+        with db_connection() as conn:
+            feedback_ids = prepare_data(conn, args.count)
+
+        print(f"传输: {args.transport}  数量: {args.count}  SMTP模拟延迟: {args.latency}ms  并发: {args.workers}")
+        print(f"{'链路':<12} {'封数':>6} {'耗时(s)':>9} {'封/秒':>10} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}")
+        print("-" * 72)
+
+        # 提醒链路：查询待提醒用户 -> 限速并发发送 -> 记录提醒日志
+        samples = []
+        instrument(email_service.transport, samples)
+        start = time.perf_counter()
+        summary = check_and_send_reminders()
+        report('提醒邮件', samples, time.perf_counter() - start)
+        reminders_sent = summary['success']
+
+        # 通知链路：同一事务入队 -> 投递线程认领发送 -> 记录通知日志
+        with db_connection() as conn:
+            for feedback_id in feedback_ids:
+                enqueue_status_update_notification(conn, feedback_id, '新问题', '处理中', handler_name='基准')
+            conn.commit()
+        samples.clear()
+        notifications_sent = 0
+        start = time.perf_counter()
+        while True:
+            success_count, fail_count = outbox_worker.deliver_pending()
+            notifications_sent += success_count
+            if not success_count + fail_count:
+                break
+        report('状态更新通知', samples, time.perf_counter() - start)
+
+        # 核对：提醒全部发出、每条通知恰好投递一次、另一端收到的封数与发送成功封数一致
+        sent = reminders_sent + notifications_sent
+        received = received_count(email_service.transport, server, os.path.join(tmpdir, 'spool'))
+        checks = [
+            ('提醒发送成功', reminders_sent, summary['total']),
+            ('通知投递成功', notifications_sent, len(feedback_ids)),
+            ('发送/接收封数', sent, received),
+        ]
+        print("-" * 72)
+        ok = True
+        for name, actual, expected in checks:
+            passed = actual == expected
+            ok = ok and passed
+            print(f"{name:<12} {actual:>6} / {expected:<6} {'通过' if passed else '不一致'}")
+        return ok
+    finally:
+        email_service.transport.close()
+        server.stop()
+        db_manager.close_idle()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行解码微基准
+对比旧的 dict 拷贝 + fromisoformat/strptime 逐行解析与
+注册转换器 + FeedbackRecord 解码的单行耗时
+
+使用方法：
+  python benchmark_row_decoding.py            # 默认 20000 行
+  python benchmark_row_decoding.py 100000     # 指定行数
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from database import create_tables, fetch_feedback
+
+QUERY = 'SELECT f.*, u.username, u.name FROM feedback f JOIN users u ON f.user_id = u.id ORDER BY f.created_at DESC'
+
+def prepare_database(path: str, rows: int):
+    """生成测试数据：一半时间戳由 datetime.now() 写入，一半为 CURRENT_TIMESTAMP 格式"""
+    conn = sqlite3.connect(path)
+    create_tables(conn)
+    conn.execute("INSERT INTO users (username, password, email, name) VALUES ('bench', 'x', 'bench@example.com', '基准')")
+    base = datetime(2024, 1, 1, 9, 0, 0)
+    data = []
+    for i in range(rows):
+        created = base + timedelta(minutes=i)
+        created_text = created.isoformat(' ') if i % 2 else created.strftime('%Y-%m-%d %H:%M:%S')
+        updated_text = (created + timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S') if i % 3 == 0 else None
+        data.append((f'bench-{i}', 1, f'问题内容 {i}', '新问题', created_text, updated_text))
+    conn.executemany(
+        'INSERT INTO feedback (id, user_id, content, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+        data
+    )
+    conn.commit()
+    conn.close()
+
+def legacy_decode(path: str):
+    """旧实现：sqlite3.Row -> dict，逐行 try/fromisoformat/except/strptime"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(QUERY).fetchall()
+    result = []
+    for feedback in rows:
+        feedback_dict = dict(feedback)
+        if feedback_dict['created_at']:
+            try:
+                feedback_dict['created_at'] = datetime.fromisoformat(feedback_dict['created_at'].replace('Z', '+00:00'))
+            except:
+                feedback_dict['created_at'] = datetime.strptime(feedback_dict['created_at'], '%Y-%m-%d %H:%M:%S')
+        if feedback_dict['updated_at']:
+            try:
+                feedback_dict['updated_at'] = datetime.fromisoformat(feedback_dict['updated_at'].replace('Z', '+00:00'))
+            except:
+                feedback_dict['updated_at'] = datetime.strptime(feedback_dict['updated_at'], '%Y-%m-%d %H:%M:%S')
+        result.append(feedback_dict)
+    conn.close()
+    return result
+
+def record_decode(path: str):
+    """新实现：PARSE_DECLTYPES 转换器 + FeedbackRecord"""
+    conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.row_factory = sqlite3.Row
+    result = fetch_feedback(conn, QUERY)
+    conn.close()
+    return result
+
+def measure(func, path: str, rows: int, repeat: int = 5) -> float:
+    """返回多次运行中最快一次的单行耗时（微秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / rows * 1_000_000
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'benchmark.db')
+        prepare_database(path, rows)
+        run(path, rows)
+
+def run(path: str, rows: int):
+    """校验结果一致后输出对比"""
+    # 两种实现解析结果必须一致
+    legacy = legacy_decode(path)
+    records = record_decode(path)
+    assert [(r['id'], r['created_at'], r['updated_at']) for r in legacy] == \
+           [(r.id, r.created_at, r.updated_at) for r in records]
+
+    legacy_cost = measure(legacy_decode, path, rows)
+    record_cost = measure(record_decode, path, rows)
+
+    print(f"行数: {rows}")
+    print(f"{'实现':<36} {'单行耗时(µs)':>12}")
+    print("-" * 50)
+    print(f"{'dict + fromisoformat/strptime':<36} {legacy_cost:>12.2f}")
+    print(f"{'转换器 + FeedbackRecord':<36} {record_cost:>12.2f}")
+    print(f"加速比: {legacy_cost / record_cost:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,612 @@
+import os
+import json
+import base64
 import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
 from werkzeug.security import generate_password_hash
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from typing import List, Optional, Tuple, Dict
+from flask import g, has_app_context
+
+logger = logging.getLogger(__name__)
+
+DATABASE = os.getenv('DATABASE_PATH', 'feedback_system.db')
+
+def adapt_datetime(value: datetime) -> str:
+    """datetime写入格式：YYYY-MM-DD HH:MM:SS[.ffffff]"""
+    return value.isoformat(' ')
+
+def adapt_date(value: date) -> str:
+    """date写入格式：YYYY-MM-DD"""
+    return value.isoformat()
+
+def convert_timestamp(value: bytes) -> datetime:
+    """将TIMESTAMP列解析为datetime（兼容CURRENT_TIMESTAMP、datetime.now()和带Z后缀的ISO格式）"""
+    text = value.decode()
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    return datetime.fromisoformat(text)
+
+# 注册类型适配器和转换器，声明为TIMESTAMP的列在查询时直接得到datetime对象
+sqlite3.register_adapter(datetime, adapt_datetime)
+sqlite3.register_adapter(date, adapt_date)
+sqlite3.register_converter('TIMESTAMP', convert_timestamp)
+
+class FeedbackRecord:
+    """反馈记录 - 紧凑的只读行对象，模板可直接通过属性访问"""
+    
+    __slots__ = ('id', 'user_id', 'content', 'has_answer', 'answer', 'status',
+                 'revised_proposal', 'admin_comment', 'handler', 'created_at', 'updated_at',
+                 'submit_day', 'username', 'name', 'handler_name', 'snippet')
+    
+    def __init__(self, **fields):
+        for field in self.__slots__:
+            setattr(self, field, fields.get(field))
+    
+    def __repr__(self):
+        return f"<FeedbackRecord {self.id} {self.status}>"
+    
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {field: getattr(self, field) for field in self.__slots__}
+    
+    @classmethod
+    def from_cursor(cls, cursor) -> List['FeedbackRecord']:
+        """将游标结果解码为记录列表，列名映射只在每次查询时计算一次"""
+        names = [description[0] for description in cursor.description]
+        columns = [(index, name) for index, name in enumerate(names) if name in cls.__slots__]
+        missing = [field for field in cls.__slots__ if field not in names]
+        
+        cursor.row_factory = None
+        new = object.__new__
+        records = []
+        for row in cursor:
+            record = new(cls)
+            for index, name in columns:
+                setattr(record, name, row[index])
+            for name in missing:
+                setattr(record, name, None)
+            records.append(record)
+        return records
+
+def fetch_feedback(conn, query: str, params=()) -> List[FeedbackRecord]:
+    """执行反馈查询并返回 FeedbackRecord 列表"""
+    return FeedbackRecord.from_cursor(conn.execute(query, params))
+
+class Page:
+    """键集分页结果"""
+    
+    __slots__ = ('items', 'next_cursor', 'prev_cursor')
+    
+    def __init__(self, items: List[FeedbackRecord], next_cursor: Optional[str] = None,
+                 prev_cursor: Optional[str] = None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+def encode_cursor(sort_value, record_id: str) -> str:
+    """将排序键编码为URL安全的游标"""
+    if isinstance(sort_value, datetime):
+        sort_value = adapt_datetime(sort_value)
+    raw = json.dumps([sort_value, record_id], ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple[str, str]]:
+    """解析游标，无效游标返回None"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        sort_value, record_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(sort_value, str) or not isinstance(record_id, str):
+        return None
+    return sort_value, record_id
+
+def fetch_feedback_page(conn, query: str, conditions: List[str], params: list, sort_column: str,
+                        after: Optional[str] = None, before: Optional[str] = None,
+                        page_size: int = 20) -> Page:
+    """按 (sort_column, id) 倒序进行键集分页
+
+    query 为不含 WHERE/ORDER BY 的查询语句，反馈表别名须为 f；
+    after 返回游标之后（更旧）的一页，before 返回游标之前（更新）的一页。
+    排序键为空的记录无法生成游标，不参与分页；游标无效时返回空页，而不是回到第一页。
+    """
+    conditions = list(conditions)
+    params = list(params)
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+    if (after and not after_key) or (before and not before_key):
+        return Page([])
+    conditions.append(f'f.{sort_column} IS NOT NULL')
+    
+    if before_key:
+        conditions.append(f'(f.{sort_column}, f.id) > (?, ?)')
+        params.extend(before_key)
+        order = 'ASC'
+    else:
+        if after_key:
+            conditions.append(f'(f.{sort_column}, f.id) < (?, ?)')
+            params.extend(after_key)
+        order = 'DESC'
+    
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    records = fetch_feedback(conn, f'''
+        {query}
+        {where_clause}
+        ORDER BY f.{sort_column} {order}, f.id {order}
+        LIMIT ?
+    ''', params + [page_size + 1])
+    
+    has_more = len(records) > page_size
+    items = records[:page_size]
+    if before_key:
+        items.reverse()
+    if not items:
+        return Page(items)
+    
+    first = encode_cursor(getattr(items[0], sort_column), items[0].id)
+    last = encode_cursor(getattr(items[-1], sort_column), items[-1].id)
+    if before_key:
+        return Page(items, next_cursor=last, prev_cursor=first if has_more else None)
+    return Page(items, next_cursor=last if has_more else None, prev_cursor=first if after_key else None)
+
+def count_feedback_by_status(conn, user_id: int) -> Dict[str, int]:
+    """按状态统计某个用户的反馈数量，包含 total"""
+    rows = conn.execute(
+        'SELECT status, COUNT(*) as count FROM feedback WHERE user_id = ? GROUP BY status',
+        (user_id,)
+    ).fetchall()
+    counts = {row['status']: row['count'] for row in rows}
+    counts['total'] = sum(counts.values())
+    return counts
+
+def get_feedback_stats(conn) -> Dict[str, int]:
+    """读取触发器维护的全局状态计数 {状态: 数量}，包含 total"""
+    rows = conn.execute('SELECT status, count FROM feedback_stats').fetchall()
+    counts = {row['status']: row['count'] for row in rows if row['count']}
+    counts['total'] = sum(counts.values())
+    return counts
+
+def day_range(day: date) -> Tuple[datetime, datetime]:
+    """返回某天的 [当日0点, 次日0点) 区间，用于可走索引的时间范围条件"""
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+def get_notification_stats(conn, day: Optional[date] = None) -> Dict[str, int]:
+    """单次扫描统计通知日志：total、success、failed、today
+
+    按 status 分组由 (status, sent_at) 覆盖索引完成，当日数量使用时间区间比较，
+    不再对每行调用 date(sent_at)。
+    """
+    start, end = day_range(day or date.today())
+    rows = conn.execute('''
+        SELECT status, COUNT(*) AS count, SUM(sent_at >= ? AND sent_at < ?) AS today
+        FROM notification_logs
+        GROUP BY status
+    ''', (start, end)).fetchall()
+    counts = {row['status']: row['count'] for row in rows}
+    return {
+        'total': sum(counts.values()),
+        'success': counts.get('成功', 0),
+        'failed': counts.get('失败', 0),
+        'today': sum(row['today'] or 0 for row in rows),
+    }
+
+def fetch_rows_page(conn, query: str, conditions: List[str], params: list, sort_column: str, id_column: str,
+                    after: Optional[str] = None, page_size: int = 50, descending: bool = True) -> Page:
+    """按 (sort_column, id_column) 键集分页读取整数主键的表，返回字典行
+
+    query 为不含 WHERE/ORDER BY 的查询语句，sort_column/id_column 带表别名（如 nl.sent_at）；
+    after 返回游标之后的一页，descending 为 False 时按升序排列。
+    """
+    conditions = list(conditions)
+    params = list(params)
+    after_key = decode_cursor(after)
+    if after_key:
+        try:
+            params.extend([after_key[0], int(after_key[1])])
+            conditions.append(f"({sort_column}, {id_column}) {'<' if descending else '>'} (?, ?)")
+        except ValueError:
+            pass
+    
+    order = 'DESC' if descending else 'ASC'
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    rows = conn.execute(f'''
+        {query}
+        {where_clause}
+        ORDER BY {sort_column} {order}, {id_column} {order}
+        LIMIT ?
+    ''', params + [page_size + 1]).fetchall()
+    
+    items = [dict(row) for row in rows[:page_size]]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = items[-1]
+        next_cursor = encode_cursor(last[sort_column.split('.')[-1]], str(last[id_column.split('.')[-1]]))
+    return Page(items, next_cursor=next_cursor)
+
+def fetch_notification_logs_page(conn, conditions: List[str], params: list,
+                                 after: Optional[str] = None, page_size: int = 50) -> Page:
+    """按 (sent_at, id) 倒序分页读取通知日志明细，通知日志表别名为 nl"""
+    return fetch_rows_page(conn, '''
+        SELECT nl.*, u.name as user_name
+        FROM notification_logs nl
+        LEFT JOIN users u ON nl.user_id = u.id
+    ''', conditions, params, 'nl.sent_at', 'nl.id', after, page_size)
+
+def fetch_operation_logs_page(conn, conditions: List[str], params: list,
+                              after: Optional[str] = None, page_size: int = 50) -> Page:
+    """按 (created_at, id) 倒序分页读取操作日志，操作日志表别名为 ol"""
+    return fetch_rows_page(conn, '''
+        SELECT ol.*, u.name as operator_name
+        FROM operation_logs ol
+        LEFT JOIN users u ON ol.operator_id = u.id
+    ''', conditions, params, 'ol.created_at', 'ol.id', after, page_size)
+
+def fetch_users_status_page(conn, day: str, conditions: List[str], params: list,
+                            after: Optional[str] = None, page_size: int = 50) -> Page:
+    """按 (name, id) 升序分页读取普通用户及其 day 当天的提交数量"""
+    return fetch_rows_page(conn, '''
+        SELECT u.id, u.username, u.email, u.backup_email, u.name,
+               COALESCE(q.count, 0) as feedback_count
+        FROM users u
+        LEFT JOIN daily_quota q ON q.user_id = u.id AND q.day = ?
+    ''', ['u.is_admin = 0'] + list(conditions), [day] + list(params), 'u.name', 'u.id',
+        after, page_size, descending=False)
+
+def create_feedback_stats(conn):
+    """创建状态计数表及维护触发器"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS feedback_stats (
+            status TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_stats_insert AFTER INSERT ON feedback
+        BEGIN
+            INSERT INTO feedback_stats (status, count) VALUES (IFNULL(NEW.status, ''), 1)
+            ON CONFLICT (status) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_stats_update AFTER UPDATE OF status ON feedback
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE feedback_stats SET count = count - 1 WHERE status = IFNULL(OLD.status, '');
+            INSERT INTO feedback_stats (status, count) VALUES (IFNULL(NEW.status, ''), 1)
+            ON CONFLICT (status) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_stats_delete AFTER DELETE ON feedback
+        BEGIN
+            UPDATE feedback_stats SET count = count - 1 WHERE status = IFNULL(OLD.status, '');
+        END
+    ''')
+    rebuild_feedback_stats(conn)
+
+def rebuild_feedback_stats(conn):
+    """根据 feedback 表重新计算状态计数"""
+    conn.execute('DELETE FROM feedback_stats')
+    conn.execute('''
+        INSERT INTO feedback_stats (status, count)
+        SELECT IFNULL(status, ''), COUNT(*) FROM feedback GROUP BY IFNULL(status, '')
+    ''')
+
+# 数据版本：表名 -> 每次写入时递增的版本范围（行中 user_id 对应的用户范围 user:<id> 同时递增）
+DATA_VERSION_TABLES = {
+    'feedback': 'user_id',
+    'users': 'id',
+    'notification_logs': None,
+}
+
+def create_data_versions(conn):
+    """创建数据版本表及维护触发器
+
+    feedback、users、notification_logs 的每次写入都使对应范围的版本号加一，
+    与该行相关的用户范围 user:<id> 同时加一，页面据此生成 ETag/Last-Modified。
+    触发器在数据库内维护，其他进程（定时任务进程）的写入同样生效。
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            scope TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL
+        )
+    ''')
+    for table, user_column in DATA_VERSION_TABLES.items():
+        for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            values = [f"('{table}', 1, CURRENT_TIMESTAMP)"]
+            if user_column:
+                values.append(f"('user:' || {row}.{user_column}, 1, CURRENT_TIMESTAMP)")
+                if event == 'UPDATE':
+                    values.append(f"('user:' || OLD.{user_column}, 1, CURRENT_TIMESTAMP)")
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO data_versions (scope, version, updated_at) VALUES {', '.join(values)}
+                    ON CONFLICT (scope) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at;
+                END
+            ''')
+
+def create_outbox_version_triggers(conn):
+    """发件箱新邮件入队或死信重新投递时递增 email_outbox 版本
+
+    投递线程运行在定时任务进程中，据此发现Web进程写入的新邮件；投递线程自身的
+    认领和结果更新不改变版本，避免唤醒自己。
+    """
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_email_outbox_version_insert AFTER INSERT ON email_outbox
+        BEGIN
+            INSERT INTO data_versions (scope, version, updated_at) VALUES ('email_outbox', 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (scope) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_email_outbox_version_requeue AFTER UPDATE OF status ON email_outbox
+        WHEN OLD.status = '死信' AND NEW.status = '待发送'
+        BEGIN
+            INSERT INTO data_versions (scope, version, updated_at) VALUES ('email_outbox', 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (scope) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at;
+        END
+    ''')
+
+def get_data_versions(conn, scopes: List[str]) -> Tuple[Tuple[int, ...], Optional[datetime]]:
+    """读取各范围的版本号（按 scopes 顺序，未写入过为0）及其中最近的写入时间（UTC）"""
+    rows = conn.execute(
+        f"SELECT scope, version, updated_at FROM data_versions WHERE scope IN ({', '.join(['?'] * len(scopes))})",
+        scopes
+    ).fetchall()
+    found = {row['scope']: row for row in rows}
+    versions = tuple(found[scope]['version'] if scope in found else 0 for scope in scopes)
+    updated_at = max((row['updated_at'] for row in rows), default=None)
+    return versions, updated_at
+
+# 全文检索摘要中的高亮标记，由展示层替换为具体样式
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+# 参与全文检索的反馈字段
+SEARCH_COLUMNS = ('content', 'answer', 'revised_proposal', 'admin_comment')
+
+def search_index_available(conn) -> bool:
+    """全文检索索引是否存在（SQLite不支持FTS5 trigram时不会创建）"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'feedback_fts'"
+    ).fetchone() is not None
+
+def create_search_index(conn):
+    """创建 FTS5 全文检索表（trigram分词，适用于中文）并由触发器保持同步
+
+    索引行的 rowid 与反馈行的 rowid 一致，触发器按 rowid 定位索引行，无需扫描全文索引。
+    """
+    try:
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS feedback_fts USING fts5(
+                {', '.join(SEARCH_COLUMNS)},
+                tokenize = 'trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning(f"当前SQLite不支持FTS5 trigram分词，跳过全文检索索引: {e}")
+        return
+    
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'NEW.{column}' for column in SEARCH_COLUMNS)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_fts_insert AFTER INSERT ON feedback
+        BEGIN
+            INSERT INTO feedback_fts (rowid, {columns}) VALUES (NEW.rowid, {new_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_fts_update AFTER UPDATE OF {columns} ON feedback
+        BEGIN
+            DELETE FROM feedback_fts WHERE rowid = OLD.rowid;
+            INSERT INTO feedback_fts (rowid, {columns}) VALUES (NEW.rowid, {new_values});
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_fts_delete AFTER DELETE ON feedback
+        BEGIN
+            DELETE FROM feedback_fts WHERE rowid = OLD.rowid;
+        END
+    ''')
+    rebuild_search_index(conn)
+
+def recreate_search_index(conn):
+    """删除旧的全文检索表及触发器后按 rowid 对应关系重新创建"""
+    for trigger in ('trg_feedback_fts_insert', 'trg_feedback_fts_update', 'trg_feedback_fts_delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.execute('DROP TABLE IF EXISTS feedback_fts')
+    create_search_index(conn)
+
+def rebuild_search_index(conn):
+    """根据 feedback 表重建全文检索索引（VACUUM 可能改变反馈行的 rowid，之后需重建）"""
+    columns = ', '.join(SEARCH_COLUMNS)
+    conn.execute('DELETE FROM feedback_fts')
+    conn.execute(f'INSERT INTO feedback_fts (rowid, {columns}) SELECT rowid, {columns} FROM feedback')
+
+def build_match_query(text: str) -> Optional[str]:
+    """将搜索词转换为FTS5短语查询；trigram分词要求每个词至少3个字符，否则返回None"""
+    terms = text.split()
+    if not terms or any(len(term) < 3 for term in terms):
+        return None
+    return ' AND '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+def search_feedback_page(conn, text: str, conditions: List[str], params: list,
+                         after: Optional[str] = None, before: Optional[str] = None,
+                         page_size: int = 20) -> Page:
+    """问题列表搜索：有全文索引时按BM25排序并返回高亮摘要，否则回退为LIKE匹配
+
+    搜索结果按相关度排序，游标为结果偏移量，after/before 均表示目标页的起始偏移。
+    """
+    token = after or before
+    offset = int(token) if token and token.isdigit() else 0
+    conditions = list(conditions)
+    params = list(params)
+    match_query = build_match_query(text) if search_index_available(conn) else None
+    
+    if match_query:
+        conditions.insert(0, 'feedback_fts MATCH ?')
+        params.insert(0, match_query)
+        # bm25权重依次对应 content、answer、revised_proposal、admin_comment
+        records = fetch_feedback(conn, f'''
+            SELECT f.*, u.username, u.name,
+                   handler_user.name as handler_name,
+                   snippet(feedback_fts, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 24) as snippet
+            FROM feedback_fts
+            JOIN feedback f ON f.rowid = feedback_fts.rowid
+            JOIN users u ON f.user_id = u.id
+            LEFT JOIN users handler_user ON f.handler = handler_user.name
+            WHERE {' AND '.join(conditions)}
+            ORDER BY bm25(feedback_fts, 10.0, 3.0, 5.0, 1.0)
+            LIMIT ? OFFSET ?
+        ''', params + [page_size + 1, offset])
+    else:
+        conditions.append('(' + ' OR '.join(f'f.{column} LIKE ?' for column in SEARCH_COLUMNS) + ')')
+        params.extend([f'%{text}%'] * len(SEARCH_COLUMNS))
+        records = fetch_feedback(conn, f'''
+            SELECT f.*, u.username, u.name,
+                   handler_user.name as handler_name
+            FROM feedback f
+            JOIN users u ON f.user_id = u.id
+            LEFT JOIN users handler_user ON f.handler = handler_user.name
+            WHERE {' AND '.join(conditions)}
+            ORDER BY f.created_at DESC, f.id DESC
+            LIMIT ? OFFSET ?
+        ''', params + [page_size + 1, offset])
+    
+    next_cursor = str(offset + page_size) if len(records) > page_size else None
+    prev_cursor = str(max(offset - page_size, 0)) if offset > 0 else None
+    return Page(records[:page_size], next_cursor, prev_cursor)
+
+class ConnectionManager:
+    """SQLite连接管理器 - 每线程连接池，每个请求绑定一个连接"""
+    
+    def __init__(self, database: str, pool_size: int = 4, busy_timeout: int = 5000,
+                 cached_statements: int = 256):
+        self.database = database
+        self.pool_size = pool_size
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """创建新连接并设置WAL、同步级别和忙等待超时"""
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.busy_timeout / 1000,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+        return conn
+    
+    def _idle(self) -> list:
+        """当前线程的空闲连接列表"""
+        idle = getattr(self._local, 'idle', None)
+        if idle is None:
+            idle = self._local.idle = []
+        return idle
+    
+    def acquire(self) -> sqlite3.Connection:
+        """从当前线程的连接池中取出一个连接"""
+        idle = self._idle()
+        if idle:
+            return idle.pop()
+        return self._connect()
+    
+    def release(self, conn: sqlite3.Connection):
+        """归还连接，未提交的事务会被回滚"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        idle = self._idle()
+        if len(idle) < self.pool_size:
+            idle.append(conn)
+        else:
+            conn.close()
+    
+    def close_idle(self):
+        """关闭当前线程池中的所有空闲连接"""
+        idle = self._idle()
+        while idle:
+            idle.pop().close()
+    
+    def get(self) -> sqlite3.Connection:
+        """获取当前请求绑定的连接（需在应用上下文中调用）"""
+        if 'db_conn' not in g:
+            g.db_conn = self.acquire()
+        return g.db_conn
+    
+    def teardown(self, exception=None):
+        """应用上下文结束时归还请求绑定的连接"""
+        conn = g.pop('db_conn', None)
+        if conn is not None:
+            self.release(conn)
+    
+    def init_app(self, app):
+        """在Flask应用上注册连接释放钩子"""
+        app.teardown_appcontext(self.teardown)
+    
+    @contextmanager
+    def connection(self):
+        """连接上下文管理器：应用上下文中复用请求连接，否则从池中借出并在结束时提交/回滚并归还"""
+        if has_app_context():
+            yield self.get()
+            return
+        conn = self.acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+# 全局连接管理器实例
+db_manager = ConnectionManager(DATABASE)
 
 def get_db_connection():
-    """获取数据库连接"""
-    conn = sqlite3.connect('feedback_system.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """获取数据库连接
+
+    在请求中返回绑定到当前应用上下文的连接，由teardown统一归还，调用方无需关闭；
+    在应用上下文之外返回一个池化连接，使用完毕后需调用 release_db_connection 归还。
+    """
+    if has_app_context():
+        return db_manager.get()
+    return db_manager.acquire()
+
+def release_db_connection(conn):
+    """归还在应用上下文之外获取的连接"""
+    db_manager.release(conn)
+
+def db_connection():
+    """数据库连接上下文管理器"""
+    return db_manager.connection()
 
 def create_tables(conn):
     """创建所有数据库表"""
+    # 新建的空数据库启用增量空间回收（连接已切换WAL，需VACUUM才生效，空库瞬间完成）；
+    # 已有数据库用 python log_archive.py vacuum 一次性转换
+    if conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()[0] == 0:
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+    
     # 创建用户表
     conn.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -92,6 +689,332 @@ def create_tables(conn):
         )
     ''')
 
+# 数据库迁移列表：(版本号, 描述, 步骤)，步骤为SQL语句或接收连接的函数，按版本号顺序执行
+MIGRATIONS = [
+    (1, '热点查询索引', [
+        'CREATE INDEX IF NOT EXISTS idx_feedback_user_created ON feedback (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_feedback_status_created ON feedback (status, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_feedback_status_updated ON feedback (status, updated_at)',
+        'CREATE INDEX IF NOT EXISTS idx_reminder_logs_user_sent ON reminder_logs (user_id, sent_at DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_notification_logs_sent ON notification_logs (sent_at)',
+        'CREATE INDEX IF NOT EXISTS idx_operation_logs_feedback ON operation_logs (feedback_id)',
+    ]),
+    (2, '反馈提交日期列 submit_day', [
+        lambda conn: add_column_if_missing(conn, 'feedback', 'submit_day', 'TEXT'),
+        'UPDATE feedback SET submit_day = DATE(created_at) WHERE submit_day IS NULL',
+        # 兜底：未显式写入 submit_day 的插入（如SQL工具）由触发器补齐
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_feedback_submit_day
+        AFTER INSERT ON feedback
+        WHEN NEW.submit_day IS NULL
+        BEGIN
+            UPDATE feedback SET submit_day = DATE(NEW.created_at) WHERE id = NEW.id;
+        END
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_feedback_user_day ON feedback (user_id, submit_day)',
+        'CREATE INDEX IF NOT EXISTS idx_feedback_day_user ON feedback (submit_day, user_id)',
+    ]),
+    (3, '每日提交名额计数表 daily_quota', [
+        '''
+        CREATE TABLE IF NOT EXISTS daily_quota (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            last_seq INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        lambda conn: backfill_daily_quota(conn),
+    ]),
+    (4, '已解决反馈补齐 updated_at（键集分页排序键）', [
+        "UPDATE feedback SET updated_at = created_at WHERE status = '已解决' AND updated_at IS NULL",
+        # 排序索引带上 id，使 (时间, id) 键集条件和排序都能直接走索引
+        'DROP INDEX IF EXISTS idx_feedback_user_created',
+        'DROP INDEX IF EXISTS idx_feedback_status_created',
+        'DROP INDEX IF EXISTS idx_feedback_status_updated',
+        'CREATE INDEX IF NOT EXISTS idx_feedback_user_created_id ON feedback (user_id, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_feedback_status_created_id ON feedback (status, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_feedback_status_updated_id ON feedback (status, updated_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_feedback_created_id ON feedback (created_at, id)',
+    ]),
+    (5, '全文检索索引 feedback_fts', [
+        lambda conn: create_search_index(conn),
+    ]),
+    (6, '触发器维护的状态计数表 feedback_stats', [
+        lambda conn: create_feedback_stats(conn),
+    ]),
+    (7, '通知日志统计覆盖索引', [
+        # 按 status 分组的单次扫描统计和按状态筛选的分页都只需读取该索引
+        'CREATE INDEX IF NOT EXISTS idx_notification_logs_status_sent ON notification_logs (status, sent_at)',
+    ]),
+    (8, '日志归档时间索引', [
+        # 归档任务按时间列范围分批读取和删除
+        'CREATE INDEX IF NOT EXISTS idx_reminder_logs_sent ON reminder_logs (sent_at)',
+        'CREATE INDEX IF NOT EXISTS idx_operation_logs_created ON operation_logs (created_at)',
+    ]),
+    (9, '邮件发件箱 email_outbox', [
+        '''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            notification_type TEXT NOT NULL,
+            feedback_id TEXT,
+            user_id INTEGER NOT NULL,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            old_status TEXT,
+            new_status TEXT,
+            handler_name TEXT,
+            status TEXT NOT NULL DEFAULT '待发送',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_until TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        # 投递线程按状态认领，已发送的历史记录不参与扫描
+        "CREATE INDEX IF NOT EXISTS idx_email_outbox_claim ON email_outbox (status, lease_until) WHERE status IN ('待发送', '发送中')",
+    ]),
+    (10, '用户最近提醒邮箱 last_reminder_email', [
+        lambda conn: add_column_if_missing(conn, 'users', 'last_reminder_email', 'TEXT'),
+        '''
+        UPDATE users SET last_reminder_email = l.email
+        FROM (
+            SELECT user_id, email,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY sent_at DESC, id DESC) AS rn
+            FROM reminder_logs
+        ) AS l
+        WHERE l.user_id = users.id AND l.rn = 1
+        ''',
+        # 主邮箱/备份邮箱交替依赖最近一次提醒所用邮箱，由触发器随提醒日志写入同步更新
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_reminder_logs_last_email
+        AFTER INSERT ON reminder_logs
+        BEGIN
+            UPDATE users SET last_reminder_email = NEW.email WHERE id = NEW.user_id;
+        END
+        ''',
+    ]),
+    (11, '发件箱模板参数 payload（状态更新汇总）', [
+        lambda conn: add_column_if_missing(conn, 'email_outbox', 'payload', 'TEXT'),
+    ]),
+    (12, '发件箱重试时间 next_attempt_at 与死信状态', [
+        lambda conn: add_column_if_missing(conn, 'email_outbox', 'next_attempt_at', 'TIMESTAMP'),
+        'UPDATE email_outbox SET next_attempt_at = created_at WHERE next_attempt_at IS NULL',
+        # 此前发送失败的邮件不再重试，转入死信以便管理员重新投递
+        "UPDATE email_outbox SET status = '死信' WHERE status = '失败'",
+        # 投递线程按到期时间轮询待发送邮件，并据此计算下一次唤醒时间
+        'CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)',
+        # 认领条件以参数传入状态，部分索引无法命中，由上面的索引取代
+        'DROP INDEX IF EXISTS idx_email_outbox_claim',
+    ]),
+    (13, '定时任务租约表 job_leases', [
+        # 同一任务的同一次计划触发只允许一个进程执行，主键即互斥条件
+        '''
+        CREATE TABLE IF NOT EXISTS job_leases (
+            job_id TEXT NOT NULL,
+            fire_time TIMESTAMP NOT NULL,
+            owner TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT '运行中',
+            acquired_at TIMESTAMP NOT NULL,
+            heartbeat_at TIMESTAMP NOT NULL,
+            lease_until TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP,
+            error_message TEXT,
+            PRIMARY KEY (job_id, fire_time)
+        )
+        ''',
+    ]),
+    (14, '定时任务持久化存储 apscheduler_jobs', [
+        # 调度进程重启后从此表恢复任务及其下次执行时间，错过的触发按补跑策略执行
+        '''
+        CREATE TABLE IF NOT EXISTS apscheduler_jobs (
+            id TEXT PRIMARY KEY,
+            next_run_time REAL,
+            job_state BLOB NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_apscheduler_jobs_next_run ON apscheduler_jobs (next_run_time)',
+    ]),
+    (15, '定时任务执行记录 job_runs', [
+        '''
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            fire_time TIMESTAMP NOT NULL,
+            owner TEXT,
+            started_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP,
+            duration_ms INTEGER,
+            outcome TEXT NOT NULL,
+            success_count INTEGER,
+            failed_count INTEGER,
+            error_message TEXT
+        )
+        ''',
+        # 管理页面按任务取最近记录和耗时趋势
+        'CREATE INDEX IF NOT EXISTS idx_job_runs_job_started ON job_runs (job_id, started_at)',
+        'CREATE INDEX IF NOT EXISTS idx_job_runs_started ON job_runs (started_at)',
+    ]),
+    (16, '触发器维护的数据版本表 data_versions（条件请求 ETag）', [
+        lambda conn: create_data_versions(conn),
+    ]),
+    (17, '/api/v1 按用户/操作人筛选日志的索引', [
+        'CREATE INDEX IF NOT EXISTS idx_notification_logs_user_sent ON notification_logs (user_id, sent_at)',
+        'CREATE INDEX IF NOT EXISTS idx_operation_logs_operator_created ON operation_logs (operator_id, created_at)',
+    ]),
+    (18, '实时推送事件表 live_events', [
+        '''
+        CREATE TABLE IF NOT EXISTS live_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event TEXT NOT NULL,
+            user_id INTEGER,
+            data TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL
+        )
+        ''',
+    ]),
+    (19, '发件箱入队版本触发器（跨进程唤醒投递线程）', [
+        lambda conn: create_outbox_version_triggers(conn),
+    ]),
+    (20, '全文检索索引改为与反馈行 rowid 对应（触发器按 rowid 删除，避免全表扫描）', [
+        lambda conn: recreate_search_index(conn),
+    ]),
+]
+
+def add_column_if_missing(conn, table, column, definition):
+    """为已有表添加列（列已存在时跳过）"""
+    columns = [row['name'] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()]
+    if column not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def backfill_daily_quota(conn):
+    """根据已有反馈回填每日名额计数，序号取当日编号的最大值以避免编号冲突"""
+    quotas = {}
+    for row in conn.execute('SELECT id, user_id, submit_day FROM feedback').fetchall():
+        key = (row['user_id'], row['submit_day'])
+        count, last_seq = quotas.get(key, (0, 0))
+        suffix = row['id'].rsplit('-', 1)[-1]
+        seq = int(suffix) if suffix.isdigit() else 0
+        quotas[key] = (count + 1, max(last_seq, seq, count + 1))
+    
+    conn.executemany(
+        'INSERT OR REPLACE INTO daily_quota (user_id, day, count, last_seq) VALUES (?, ?, ?, ?)',
+        [(user_id, day, count, last_seq) for (user_id, day), (count, last_seq) in quotas.items()]
+    )
+
+def get_daily_count(conn, user_id, day):
+    """获取用户某天已提交的反馈数量"""
+    row = conn.execute(
+        'SELECT count FROM daily_quota WHERE user_id = ? AND day = ?',
+        (user_id, day)
+    ).fetchone()
+    return row['count'] if row else 0
+
+def reserve_daily_slot(conn, user_id, day, limit):
+    """在 BEGIN IMMEDIATE 事务中占用一个当日提交名额并分配序号
+
+    事务由本函数开启，连接上不能有未提交的事务（否则抛出 RuntimeError）：在延迟事务中
+    升级写锁可能直接失败（SQLITE_BUSY），超限回滚也会丢弃调用方的修改。
+    成功时返回序号，事务保持打开，由调用方写入反馈后提交；已达上限时回滚并返回 None。
+    """
+    if conn.in_transaction:
+        raise RuntimeError('reserve_daily_slot 需在没有未提交事务的连接上调用')
+    conn.execute('BEGIN IMMEDIATE')
+    
+    cursor = conn.execute('''
+        INSERT INTO daily_quota (user_id, day, count, last_seq) VALUES (?, ?, 1, 1)
+        ON CONFLICT (user_id, day) DO UPDATE SET count = count + 1, last_seq = last_seq + 1
+        WHERE count < ?
+    ''', (user_id, day, limit))
+    
+    if cursor.rowcount == 0:
+        conn.rollback()
+        return None
+    
+    return conn.execute(
+        'SELECT last_seq FROM daily_quota WHERE user_id = ? AND day = ?',
+        (user_id, day)
+    ).fetchone()['last_seq']
+
+def release_daily_slot(conn, user_id, day):
+    """删除反馈后归还当日名额（序号不回收，避免编号重复）"""
+    conn.execute(
+        'UPDATE daily_quota SET count = count - 1 WHERE user_id = ? AND day = ? AND count > 0',
+        (user_id, day)
+    )
+
+def create_schema_version_table(conn):
+    """创建迁移版本记录表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def get_applied_migrations(conn):
+    """获取已执行的迁移 {版本号: 执行时间}"""
+    create_schema_version_table(conn)
+    rows = conn.execute('SELECT version, applied_at FROM schema_version ORDER BY version').fetchall()
+    return {row['version']: row['applied_at'] for row in rows}
+
+def get_pending_migrations(conn):
+    """获取尚未执行的迁移"""
+    applied = get_applied_migrations(conn)
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m[0]) if m[0] not in applied]
+
+def apply_migrations(conn):
+    """按顺序执行所有待执行的迁移，每个迁移在独立事务中完成"""
+    if conn.in_transaction:
+        conn.commit()
+    
+    applied_versions = []
+    for version, description, steps in get_pending_migrations(conn):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # 获取写锁后再次确认，避免多个进程重复执行同一迁移
+            if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,)).fetchone():
+                conn.rollback()
+                continue
+            
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            
+            conn.execute(
+                'INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                (version, description, datetime.now())
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        applied_versions.append(version)
+        print(f"已执行迁移: {version} - {description}")
+    
+    return applied_versions
+
+def show_migration_status(conn):
+    """显示已执行和待执行的迁移"""
+    applied = get_applied_migrations(conn)
+    
+    print(f"{'版本':<6} {'状态':<8} {'执行时间':<28} 描述")
+    print("-" * 70)
+    for version, description, _ in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in applied:
+            print(f"{version:<6} {'已执行':<8} {str(applied[version]):<28} {description}")
+        else:
+            print(f"{version:<6} {'待执行':<8} {'':<28} {description}")
+
 def insert_initial_users(conn):
     """插入初始用户数据"""
     # 预置用户数据 (username, password, email, backup_email, name, is_admin)
@@ -134,6 +1057,9 @@ def init_db():
         create_tables(conn)
         print("数据库表创建完成")
         
+        # 执行待执行的迁移
+        apply_migrations(conn)
+        
         # 插入初始用户数据
         insert_initial_users(conn)
         
@@ -146,7 +1072,79 @@ def init_db():
         conn.rollback()
         raise
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+def migrate():
+    """仅执行数据库迁移"""
+    conn = get_db_connection()
+    try:
+        create_tables(conn)
+        applied = apply_migrations(conn)
+        if not applied:
+            print("没有待执行的迁移")
+    finally:
+        release_db_connection(conn)
+
+def migration_status():
+    """查看迁移状态"""
+    conn = get_db_connection()
+    try:
+        show_migration_status(conn)
+    finally:
+        release_db_connection(conn)
+
+def rebuild_stats():
+    """重新计算状态计数表"""
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        rebuild_feedback_stats(conn)
+        conn.commit()
+        print("状态计数重建完成")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db_connection(conn)
+
+def rebuild_search():
+    """创建（如缺失）并重建全文检索索引"""
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        if search_index_available(conn):
+            rebuild_search_index(conn)
+        else:
+            create_search_index(conn)
+        conn.commit()
+        if search_index_available(conn):
+            print("全文检索索引重建完成")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db_connection(conn)
 
 if __name__ == '__main__':
-    init_db()
\ No newline at end of file
+    import sys
+    
+    if len(sys.argv) > 1:
+        command = sys.argv[1]
+        
+        if command == 'migrate':
+            migrate()
+        elif command == 'status':
+            migration_status()
+        elif command == 'rebuild-search':
+            rebuild_search()
+        elif command == 'rebuild-stats':
+            rebuild_stats()
+        else:
+            print("使用方法:")
+            print("  python database.py            # 初始化数据库（建表、迁移、预置用户）")
+            print("  python database.py migrate    # 执行待执行的迁移")
+            print("  python database.py status     # 查看已执行和待执行的迁移")
+            print("  python database.py rebuild-search  # 重建全文检索索引")
+            print("  python database.py rebuild-stats   # 重新计算状态计数")
+    else:
+        init_db()
\ No newline at end of file
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+邮件发件箱
+请求在修改反馈的同一事务中把通知邮件写入 email_outbox，由后台投递线程
+按租约认领、发送并把结果写入 notification_logs；进程重启后未投递的邮件继续发送。
+临时性错误（SMTP 4xx、网络错误）按指数退避加随机抖动自动重试，永久性错误（5xx）
+或重试次数用尽的邮件转入死信，由管理员在通知日志页面重新投递。
+开启汇总模式（DIGEST_WINDOW_SECONDS）时，同一收件人窗口内的状态更新通知合并为一封发送
+
+使用方法：
+  python email_outbox.py deliver     # 投递一轮待发送邮件
+  python email_outbox.py status      # 查看发件箱各状态数量
+  python email_outbox.py dead        # 列出死信
+  python email_outbox.py requeue ID  # 重新投递指定死信（ID 为 all 时重新投递全部死信）
+"""
+
+import os
+import sys
+import json
+import random
+import socket
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from itertools import groupby
+
+from database import db_connection, get_data_versions
+from email_service import EmailTemplates, DatabaseOperations, email_service, email_config, is_transient_error
+
+logger = logging.getLogger(__name__)
+
+# 发件箱状态
+OUTBOX_PENDING = '待发送'
+OUTBOX_SENDING = '发送中'
+OUTBOX_SENT = '已发送'
+OUTBOX_DEAD = '死信'
+
+# 认领租约时长（秒），投递线程异常退出后租约到期的邮件会被重新认领
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', '120'))
+# 每轮认领数量和空闲轮询间隔（秒）
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '20'))
+OUTBOX_POLL_INTERVAL = int(os.getenv('OUTBOX_POLL_INTERVAL', '30'))
+# 空闲时检查新入队邮件的间隔（秒）：读取触发器维护的 email_outbox 版本号，
+# 其他进程（Web进程）入队的邮件在此间隔内开始投递
+OUTBOX_WAKE_CHECK_SECONDS = float(os.getenv('OUTBOX_WAKE_CHECK_SECONDS', '1'))
+# 最多尝试次数，以及重试间隔的基数和上限（秒）
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '6'))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('OUTBOX_RETRY_BASE_SECONDS', '60'))
+OUTBOX_RETRY_MAX_SECONDS = int(os.getenv('OUTBOX_RETRY_MAX_SECONDS', '3600'))
+
+def retry_delay(attempts: int) -> float:
+    """第 attempts 次尝试失败后的重试间隔（秒）
+
+    间隔按尝试次数指数增长并封顶，在其一半到全额之间随机取值，
+    避免同一次故障中失败的邮件在同一时刻集中重试。
+    """
+    delay = min(OUTBOX_RETRY_MAX_SECONDS, OUTBOX_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+def enqueue_email(conn, notification_type: str, user_id: int, recipient: str, subject: str, body: str,
+                  feedback_id: str = None, old_status: str = None, new_status: str = None,
+                  handler_name: str = '', payload: Dict = None) -> int:
+    """写入一封待发送邮件，不提交事务（由调用方随业务修改一起提交）
+
+    payload 为渲染模板所用的参数，汇总模式据此重新渲染合并邮件。
+    """
+    now = datetime.now()
+    cursor = conn.execute('''
+        INSERT INTO email_outbox (notification_type, feedback_id, user_id, recipient, subject, body,
+                                  old_status, new_status, handler_name, payload, status, created_at, next_attempt_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (notification_type, feedback_id, user_id, recipient, subject, body,
+          old_status, new_status, handler_name,
+          json.dumps(payload, ensure_ascii=False) if payload else None,
+          OUTBOX_PENDING, now, now))
+    return cursor.lastrowid
+
+def enqueue_status_update_notification(conn, feedback_id: str, old_status: str, new_status: str,
+                                       admin_comment: str = '', revised_proposal: str = '',
+                                       handler_name: str = '') -> bool:
+    """在当前事务中写入问题状态更新通知"""
+    feedback_info = conn.execute('''
+        SELECT f.id, f.content, u.id as user_id, u.username, u.email, u.name
+        FROM feedback f
+        JOIN users u ON f.user_id = u.id
+        WHERE f.id = ?
+    ''', (feedback_id,)).fetchone()
+    if not feedback_info:
+        logger.error(f"未找到问题信息: {feedback_id}")
+        return False
+
+    username = feedback_info['name'] or feedback_info['username']
+    entry = {
+        'feedback_id': feedback_id,
+        'feedback_content': feedback_info['content'],
+        'old_status': old_status,
+        'new_status': new_status,
+        'handler_name': handler_name,
+        'admin_comment': admin_comment,
+        'revised_proposal': revised_proposal,
+    }
+    subject, body = EmailTemplates.status_update_notification(username, system_url=email_config.SYSTEM_URL, **entry)
+    enqueue_email(conn, '状态更新', feedback_info['user_id'], feedback_info['email'], subject, body,
+                  feedback_id=feedback_id, old_status=old_status, new_status=new_status,
+                  handler_name=handler_name, payload={'username': username, 'entry': entry})
+    return True
+
+def enqueue_deletion_notification(conn, feedback_id: str, user_id: int, username: str,
+                                  feedback_content: str, admin_name: str, deletion_reason: str = '') -> bool:
+    """在当前事务中写入问题删除通知（交替使用主邮箱和备份邮箱）"""
+    target_email = DatabaseOperations.resolve_target_emails(conn, [user_id]).get(user_id)
+    if not target_email:
+        logger.warning(f"用户 {username} 没有有效邮箱地址")
+        return False
+
+    subject, body = EmailTemplates.deletion_notification(username, feedback_content, admin_name, deletion_reason)
+    enqueue_email(conn, 'delete_notification', user_id, target_email, subject, body,
+                  feedback_id=feedback_id, handler_name=admin_name)
+    return True
+
+def get_outbox_counts(conn) -> Dict[str, int]:
+    """发件箱各状态数量"""
+    rows = conn.execute('SELECT status, COUNT(*) as count FROM email_outbox GROUP BY status').fetchall()
+    return {row['status']: row['count'] for row in rows}
+
+def get_dead_letters(conn, limit: int = 100) -> List[Dict]:
+    """最近的死信（永久性错误或重试次数用尽的邮件）"""
+    rows = conn.execute('''
+        SELECT id, notification_type, feedback_id, user_id, recipient, subject,
+               old_status, new_status, handler_name, attempts, last_error, created_at
+        FROM email_outbox
+        WHERE status = ?
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (OUTBOX_DEAD, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def requeue_dead_letters(conn, outbox_ids: List[int] = None) -> int:
+    """把死信重新放回待发送队列并重置尝试次数，outbox_ids 为空时重新投递全部死信。不提交事务"""
+    conditions = ['status = ?']
+    params = [OUTBOX_PENDING, datetime.now(), OUTBOX_DEAD]
+    if outbox_ids:
+        conditions.append(f"id IN ({', '.join(['?'] * len(outbox_ids))})")
+        params.extend(outbox_ids)
+    return conn.execute(f'''
+        UPDATE email_outbox
+        SET status = ?, attempts = 0, next_attempt_at = ?, last_error = NULL
+        WHERE {' AND '.join(conditions)}
+    ''', params).rowcount
+
+class OutboxWorker:
+    """发件箱投递线程 - 按租约认领待发送邮件并记录投递结果"""
+
+    def __init__(self, batch_size: int = OUTBOX_BATCH_SIZE, lease_seconds: int = OUTBOX_LEASE_SECONDS,
+                 poll_interval: int = OUTBOX_POLL_INTERVAL):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def claim(self, conn) -> List:
+        """认领一批已到重试时间的待发送邮件，以及租约已过期的发送中邮件
+
+        汇总模式下，状态更新通知要等该收件人最早一封待发送通知超过汇总窗口后，
+        再与其窗口内的后续通知一起认领。
+        """
+        now = datetime.now()
+        digest_window = email_config.DIGEST_WINDOW_SECONDS
+        rows = conn.execute('''
+            UPDATE email_outbox
+            SET status = ?, lease_owner = ?, lease_until = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE ((status = ? AND next_attempt_at <= ?) OR (status = ? AND lease_until < ?))
+                  AND (? <= 0 OR notification_type != '状态更新' OR recipient IN (
+                      SELECT recipient FROM email_outbox
+                      WHERE status = ? AND notification_type = '状态更新'
+                      GROUP BY recipient
+                      HAVING MIN(created_at) <= ?
+                  ) OR status = ?)
+                ORDER BY recipient, id
+                LIMIT ?
+            )
+            RETURNING *
+        ''', (OUTBOX_SENDING, self.owner, now + timedelta(seconds=self.lease_seconds),
+              OUTBOX_PENDING, now, OUTBOX_SENDING, now,
+              digest_window, OUTBOX_PENDING, now - timedelta(seconds=digest_window), OUTBOX_SENDING,
+              self.batch_size)).fetchall()
+        conn.commit()
+        return sorted(rows, key=lambda row: row['id'])
+    
+    def _group_digests(self, messages: List) -> List[List]:
+        """汇总模式下把同一收件人的状态更新通知分为一组，其余邮件各自一组"""
+        if email_config.DIGEST_WINDOW_SECONDS <= 0:
+            return [[message] for message in messages]
+        groups = []
+        digestible = []
+        for message in messages:
+            if message['notification_type'] == '状态更新' and message['payload']:
+                digestible.append(message)
+            else:
+                groups.append([message])
+        digestible.sort(key=lambda message: (message['recipient'], message['id']))
+        for _, group in groupby(digestible, key=lambda message: message['recipient']):
+            groups.append(list(group))
+        return sorted(groups, key=lambda group: group[0]['id'])
+    
+    def _render(self, group: List) -> Tuple[str, str]:
+        """单封邮件直接使用入队时渲染的内容，多封合并渲染为汇总邮件"""
+        if len(group) == 1:
+            return group[0]['subject'], group[0]['body']
+        payloads = [json.loads(message['payload']) for message in group]
+        return EmailTemplates.status_update_digest(
+            payloads[-1]['username'], [payload['entry'] for payload in payloads], email_config.SYSTEM_URL
+        )
+
+    def _finish(self, conn, message, error: str = None, transient: bool = False) -> str:
+        """记录投递结果，返回邮件的新状态
+
+        临时性错误且未用尽尝试次数时安排下一次重试，不写通知日志；
+        发送成功或最终失败（转入死信）时写入通知日志。
+        """
+        now = datetime.now()
+        if error is None:
+            status = OUTBOX_SENT
+        elif transient and message['attempts'] < OUTBOX_MAX_ATTEMPTS:
+            status = OUTBOX_PENDING
+        else:
+            status = OUTBOX_DEAD
+        next_attempt_at = now + timedelta(seconds=retry_delay(message['attempts'])) if status == OUTBOX_PENDING else None
+        updated = conn.execute('''
+            UPDATE email_outbox
+            SET status = ?, last_error = ?, sent_at = ?, next_attempt_at = ?, lease_owner = NULL, lease_until = NULL
+            WHERE id = ? AND lease_owner = ?
+        ''', (status, error, None if error else now, next_attempt_at,
+              message['id'], self.owner)).rowcount
+        if not updated:
+            # 租约已过期并被其他投递线程接手，由对方记录结果
+            conn.rollback()
+            return None
+        if status == OUTBOX_PENDING:
+            conn.commit()
+            logger.warning(f"邮件 {message['id']} 第 {message['attempts']} 次发送失败，"
+                           f"{next_attempt_at:%H:%M:%S} 重试: {error}")
+            return status
+        conn.execute('''
+            INSERT INTO notification_logs (feedback_id, user_id, email, notification_type,
+                                           old_status, new_status, status, sent_at, error_message, handler_name)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (message['feedback_id'], message['user_id'], message['recipient'], message['notification_type'],
+              message['old_status'], message['new_status'], '失败' if error else '成功', now, error,
+              message['handler_name']))
+        conn.commit()
+        return status
+
+    def deliver_pending(self) -> Tuple[int, int]:
+        """投递一轮，返回 (成功数, 失败数)，失败数包含已安排重试的邮件"""
+        success_count = fail_count = retry_count = 0
+        with db_connection() as conn:
+            for group in self._group_digests(self.claim(conn)):
+                # 合并发送的每条通知仍单独记录投递结果
+                try:
+                    subject, body = self._render(group)
+                    email_service.send_email(group[0]['recipient'], subject, body)
+                    error = None
+                    transient = False
+                    success_count += len(group)
+                except Exception as e:
+                    # 部分异常（如 ConnectionRefusedError()）没有错误信息，以异常类型名代替
+                    error = str(e) or type(e).__name__
+                    transient = is_transient_error(e)
+                    fail_count += len(group)
+                for message in group:
+                    if self._finish(conn, message, error, transient) == OUTBOX_PENDING:
+                        retry_count += 1
+        if success_count or fail_count:
+            logger.info(f"发件箱投递完成 - 成功: {success_count}, 失败: {fail_count}（待重试 {retry_count}）")
+        return success_count, fail_count
+
+    def next_due_in(self, conn) -> float:
+        """距最早一封待发送邮件可认领的秒数，没有待发送邮件时返回轮询间隔
+
+        汇总模式下状态更新通知需等到入队时间加汇总窗口之后才可认领。
+        """
+        rows = conn.execute('''
+            SELECT notification_type, created_at, next_attempt_at FROM email_outbox
+            WHERE status = ?
+            ORDER BY next_attempt_at
+            LIMIT ?
+        ''', (OUTBOX_PENDING, self.batch_size)).fetchall()
+        digest_window = timedelta(seconds=email_config.DIGEST_WINDOW_SECONDS)
+        due_times = []
+        for row in rows:
+            due = row['next_attempt_at'] or row['created_at']
+            if digest_window and row['notification_type'] == '状态更新':
+                due = max(due, row['created_at'] + digest_window)
+            due_times.append(due)
+        if not due_times:
+            return self.poll_interval
+        due_in = (min(due_times) - datetime.now()).total_seconds()
+        return min(self.poll_interval, max(0.0, due_in))
+
+    def wake(self):
+        """唤醒本进程的投递线程；其他进程入队的邮件通过 email_outbox 版本号发现"""
+        self._wakeup.set()
+
+    def _outbox_version(self) -> int:
+        with db_connection() as conn:
+            return get_data_versions(conn, ['email_outbox'])[0][0]
+
+    def _wait_for_work(self, timeout: float, version: int):
+        """等待 timeout 秒，有邮件入队（版本号变化）或被唤醒时提前返回"""
+        deadline = time.monotonic() + timeout
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._wakeup.wait(min(remaining, OUTBOX_WAKE_CHECK_SECONDS)):
+                return
+            try:
+                if self._outbox_version() != version:
+                    return
+            except Exception as e:
+                logger.error(f"读取发件箱版本失败: {str(e)}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            wait = self.poll_interval
+            version = None
+            try:
+                # 先记下版本号，本轮投递期间入队的邮件会使等待立即结束
+                version = self._outbox_version()
+                success_count, fail_count = self.deliver_pending()
+                # 本轮认领满额时可能还有积压，立即进行下一轮；否则等到最早一封邮件可认领
+                if success_count + fail_count >= self.batch_size:
+                    continue
+                with db_connection() as conn:
+                    wait = self.next_due_in(conn)
+            except Exception as e:
+                logger.error(f"发件箱投递异常: {str(e)}")
+            self._wait_for_work(wait, version)
+
+    def start(self):
+        """启动后台投递线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """停止后台投递线程（等待当前一轮结束）"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+# 全局投递线程实例
+outbox_worker = OutboxWorker()
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+
+    if command == 'deliver':
+        success_count, fail_count = outbox_worker.deliver_pending()
+        print(f"投递完成 - 成功: {success_count}, 失败: {fail_count}")
+    elif command == 'status':
+        with db_connection() as conn:
+            counts = get_outbox_counts(conn)
+        for status in (OUTBOX_PENDING, OUTBOX_SENDING, OUTBOX_SENT, OUTBOX_DEAD):
+            print(f"{status}: {counts.get(status, 0)}")
+    elif command == 'dead':
+        with db_connection() as conn:
+            dead_letters = get_dead_letters(conn)
+        for letter in dead_letters:
+            print(f"{letter['id']:>6}  {letter['notification_type']:<20} {letter['recipient']:<30} "
+                  f"尝试{letter['attempts']}次  {letter['last_error']}")
+        print(f"共 {len(dead_letters)} 封死信")
+    elif command == 'requeue' and len(sys.argv) > 2:
+        with db_connection() as conn:
+            outbox_ids = None if sys.argv[2] == 'all' else [int(sys.argv[2])]
+            count = requeue_dead_letters(conn, outbox_ids)
+            conn.commit()
+        print(f"已重新投递 {count} 封死信")
+    else:
+        print("使用方法：")
+        print("  python email_outbox.py deliver     # 投递一轮待发送邮件")
+        print("  python email_outbox.py status      # 查看发件箱各状态数量")
+        print("  python email_outbox.py dead        # 列出死信")
+        print("  python email_outbox.py requeue ID  # 重新投递指定死信（ID 为 all 时重新投递全部死信）")
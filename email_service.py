@@ -1,13 +1,16 @@
 import smtplib
 import logging
 import os
+import threading
+import socket
+import time
 from datetime import datetime, date
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
-from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Any, Tuple, List
-from database import get_db_connection
+from database import db_connection
 
 # 配置日志
 logging.basicConfig(
@@ -29,6 +32,26 @@ class EmailConfig:
         self.SYSTEM_URL = os.getenv('SYSTEM_URL', 'https://ei-power.tjh666.cn')
         self.SENDER_NAME = os.getenv('SENDER_NAME', 'EI Power反馈系统')
         
+        # SMTP连接池：最大连接数、连接最长存活秒数、单连接最多发送封数、空闲多久后复用前先NOOP检查
+        self.SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '2'))
+        self.SMTP_MAX_CONN_AGE = int(os.getenv('SMTP_MAX_CONN_AGE', '300'))
+        self.SMTP_MAX_CONN_MESSAGES = int(os.getenv('SMTP_MAX_CONN_MESSAGES', '100'))
+        self.SMTP_NOOP_AFTER_IDLE = int(os.getenv('SMTP_NOOP_AFTER_IDLE', '10'))
+        
+        # 提醒邮件分发：每个发件账户每分钟最多发送封数（0为不限速）、允许突发封数、并发发送线程数
+        self.REMINDER_RATE_PER_MINUTE = float(os.getenv('REMINDER_RATE_PER_MINUTE', '20'))
+        self.REMINDER_BURST = int(os.getenv('REMINDER_BURST', '3'))
+        self.REMINDER_WORKERS = int(os.getenv('REMINDER_WORKERS', str(self.SMTP_POOL_SIZE)))
+        
+        # 状态更新汇总模式：同一收件人在该秒数窗口内的状态更新通知合并为一封（0为关闭）
+        self.DIGEST_WINDOW_SECONDS = int(os.getenv('DIGEST_WINDOW_SECONDS', '0'))
+        
+        # 邮件传输方式：smtp（默认）、memory（内存捕获，用于测试）、spool（写入maildir目录）
+        self.MAIL_TRANSPORT = os.getenv('MAIL_TRANSPORT', 'smtp').lower()
+        self.MAIL_SPOOL_DIR = os.getenv('MAIL_SPOOL_DIR', 'mail_spool')
+        # 是否使用SMTP_SSL，本地测试服务器可关闭
+        self.SMTP_USE_SSL = os.getenv('SMTP_USE_SSL', '1') not in ('0', 'false', 'no')
+        
     def validate(self) -> bool:
         """验证邮件配置是否完整"""
         required_fields = [self.SMTP_SERVER, self.SENDER_EMAIL, self.SENDER_PASSWORD]
@@ -37,34 +60,236 @@ class EmailConfig:
 # 全局配置实例
 email_config = EmailConfig()
 
-class EmailService:
-    """邮件服务类 - 统一管理邮件发送逻辑"""
+def open_smtp_connection(config: EmailConfig) -> smtplib.SMTP:
+    """建立SMTP_SSL（或未加密SMTP）连接并完成身份验证"""
+    logger.info(f"连接SMTP服务器: {config.SMTP_SERVER}:{config.SMTP_PORT}")
+    smtp_class = smtplib.SMTP_SSL if config.SMTP_USE_SSL else smtplib.SMTP
+    server = smtp_class(config.SMTP_SERVER, config.SMTP_PORT)
+    try:
+        logger.info("进行身份验证...")
+        server.login(config.SENDER_EMAIL, config.SENDER_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+class PooledSMTPConnection:
+    """连接池中的一条已认证SMTP会话"""
     
-    def __init__(self, config: EmailConfig = None):
-        self.config = config or email_config
-        
-    @contextmanager
-    def get_smtp_connection(self):
-        """获取SMTP连接的上下文管理器"""
-        server = None
+    __slots__ = ('server', 'created_at', 'last_used', 'messages')
+    
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.created_at = self.last_used = time.monotonic()
+        self.messages = 0
+    
+    def close(self):
         try:
-            logger.info(f"连接SMTP服务器: {self.config.SMTP_SERVER}:{self.config.SMTP_PORT}")
-            server = smtplib.SMTP_SSL(self.config.SMTP_SERVER, self.config.SMTP_PORT)
-            
-            logger.info("进行身份验证...")
-            server.login(self.config.SENDER_EMAIL, self.config.SENDER_PASSWORD)
-            
-            yield server
-            
-        except Exception as e:
-            logger.error(f"SMTP连接失败: {str(e)}")
+            self.server.quit()
+        except Exception:
+            self.server.close()
+
+class SMTPConnectionPool:
+    """SMTP连接池 - 复用已认证会话，避免每封邮件重复TCP/TLS/AUTH握手
+
+    连接数不超过 SMTP_POOL_SIZE；达到最长存活时间或发送封数上限的连接会被回收；
+    空闲超过 SMTP_NOOP_AFTER_IDLE 秒的连接复用前先发送NOOP确认可用。
+    """
+    
+    def __init__(self, config: EmailConfig):
+        self.config = config
+        self._idle: List[PooledSMTPConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(config.SMTP_POOL_SIZE)
+    
+    def _expired(self, conn: PooledSMTPConnection) -> bool:
+        """连接是否已达到回收条件"""
+        return (time.monotonic() - conn.created_at >= self.config.SMTP_MAX_CONN_AGE or
+                conn.messages >= self.config.SMTP_MAX_CONN_MESSAGES)
+    
+    def _healthy(self, conn: PooledSMTPConnection) -> bool:
+        """空闲较久的连接用NOOP检查是否仍然可用"""
+        if time.monotonic() - conn.last_used < self.config.SMTP_NOOP_AFTER_IDLE:
+            return True
+        try:
+            return conn.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+    
+    def acquire(self) -> PooledSMTPConnection:
+        """借出一条可用连接，连接数已满时等待其他发送完成"""
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    return PooledSMTPConnection(open_smtp_connection(self.config))
+                if not self._expired(conn) and self._healthy(conn):
+                    return conn
+                logger.info("回收过期或失效的SMTP连接")
+                conn.close()
+        except Exception:
+            self._slots.release()
             raise
+    
+    def release(self, conn: PooledSMTPConnection, discard: bool = False):
+        """归还连接，discard 或已达回收条件时直接关闭"""
+        try:
+            if discard or self._expired(conn):
+                conn.close()
+            else:
+                conn.last_used = time.monotonic()
+                with self._lock:
+                    self._idle.append(conn)
         finally:
-            if server:
-                try:
-                    server.quit()
-                except:
-                    pass
+            self._slots.release()
+    
+    def sendmail(self, from_addr: str, to_addr: str, message: str):
+        """通过池中连接发送邮件，服务器断开连接时重连重试一次"""
+        for attempt in range(2):
+            conn = self.acquire()
+            try:
+                conn.server.sendmail(from_addr, to_addr, message)
+            except smtplib.SMTPServerDisconnected:
+                self.release(conn, discard=True)
+                if attempt:
+                    raise
+                logger.warning("SMTP连接已断开，重新连接后重试")
+                continue
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # 服务器拒收本封邮件，会话本身仍可继续使用
+                conn.messages += 1
+                self.release(conn)
+                raise
+            except Exception:
+                self.release(conn, discard=True)
+                raise
+            conn.messages += 1
+            self.release(conn)
+            return
+    
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+class MailTransport:
+    """邮件传输接口 - 负责把已生成的邮件交给具体的投递方式"""
+    
+    name = ''
+    
+    def send(self, from_addr: str, to_addr: str, message: str):
+        """投递一封邮件，失败时抛出异常"""
+        raise NotImplementedError
+    
+    def check(self):
+        """检查传输是否可用，不可用时抛出异常"""
+    
+    def close(self):
+        """释放传输占用的资源（如空闲连接）"""
+
+class SMTPTransport(MailTransport):
+    """SMTP传输 - 通过连接池复用已认证会话"""
+    
+    name = 'smtp'
+    
+    def __init__(self, config: EmailConfig):
+        self.config = config
+        self.pool = SMTPConnectionPool(config)
+    
+    def send(self, from_addr: str, to_addr: str, message: str):
+        self.pool.sendmail(from_addr, to_addr, message)
+    
+    def check(self):
+        """新建一条连接完成身份验证（不经过连接池）"""
+        server = open_smtp_connection(self.config)
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+    
+    def close(self):
+        self.pool.close_all()
+
+class MemoryTransport(MailTransport):
+    """内存传输 - 只记录邮件不发送，用于测试和演练"""
+    
+    name = 'memory'
+    
+    def __init__(self):
+        self.messages: List[Dict[str, str]] = []
+        self._lock = threading.Lock()
+    
+    def send(self, from_addr: str, to_addr: str, message: str):
+        with self._lock:
+            self.messages.append({'from': from_addr, 'to': to_addr, 'message': message})
+    
+    def clear(self):
+        with self._lock:
+            self.messages.clear()
+
+class FileSpoolTransport(MailTransport):
+    """文件传输 - 按maildir格式写入目录（先写tmp再移入new），可用邮件客户端查看"""
+    
+    name = 'spool'
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._counter = 0
+        self._lock = threading.Lock()
+        for sub in ('tmp', 'new', 'cur'):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+    
+    def send(self, from_addr: str, to_addr: str, message: str):
+        with self._lock:
+            self._counter += 1
+            filename = f'{time.time():.6f}.P{os.getpid()}Q{self._counter}.{socket.gethostname()}'
+        tmp_path = os.path.join(self.directory, 'tmp', filename)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(f'Return-Path: <{from_addr}>\nDelivered-To: {to_addr}\n{message}')
+        os.replace(tmp_path, os.path.join(self.directory, 'new', filename))
+    
+    def check(self):
+        if not os.access(self.directory, os.W_OK):
+            raise OSError(f'目录不可写: {self.directory}')
+
+def create_transport(config: EmailConfig) -> MailTransport:
+    """按 MAIL_TRANSPORT 配置创建邮件传输"""
+    if config.MAIL_TRANSPORT == 'memory':
+        return MemoryTransport()
+    if config.MAIL_TRANSPORT == 'spool':
+        return FileSpoolTransport(config.MAIL_SPOOL_DIR)
+    if config.MAIL_TRANSPORT != 'smtp':
+        logger.warning(f"未知的邮件传输方式 {config.MAIL_TRANSPORT}，使用smtp")
+    return SMTPTransport(config)
+
+def is_transient_error(error: Exception) -> bool:
+    """判断发送失败是否为临时性错误（稍后重试可能成功）
+
+    SMTP 4xx 应答、连接断开和网络超时为临时性错误；5xx 应答以及其他异常
+    （认证方式不支持、模板渲染错误等）为永久性错误，重试无意义。
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    # 连接被拒绝、超时、DNS解析失败等网络错误
+    return isinstance(error, OSError)
+
+class EmailService:
+    """邮件服务类 - 统一管理邮件发送逻辑"""
+    
+    def __init__(self, config: EmailConfig = None, transport: MailTransport = None):
+        self.config = config or email_config
+        self.transport = transport or create_transport(self.config)
     
     def create_email_message(self, recipient_email: str, subject: str, body: str) -> MIMEMultipart:
         """创建邮件消息对象"""
@@ -84,11 +309,9 @@ class EmailService:
         try:
             msg = self.create_email_message(recipient_email, subject, body)
             
-            with self.get_smtp_connection() as server:
-                logger.info("正在发送邮件...")
-                text = msg.as_string()
-                server.sendmail(self.config.SENDER_EMAIL, recipient_email, text)
-                
+            logger.info("正在发送邮件...")
+            self.transport.send(self.config.SENDER_EMAIL, recipient_email, msg.as_string())
+            
             logger.info(f"邮件发送成功: {recipient_email}")
             return True
             
@@ -100,8 +323,7 @@ class EmailService:
         """测试邮件配置"""
         logger.info("开始测试邮件配置...")
         try:
-            with self.get_smtp_connection():
-                pass  # 连接成功即可
+            self.transport.check()  # 连接成功即可
             logger.info("邮件配置测试成功")
             return True
         except Exception as e:
@@ -111,6 +333,47 @@ class EmailService:
 # 全局邮件服务实例
 email_service = EmailService()
 
+class TokenBucket:
+    """令牌桶限速器 - rate_per_minute 为稳定速率，capacity 为允许的突发封数"""
+    
+    def __init__(self, rate_per_minute: float, capacity: int = 1):
+        self.rate = rate_per_minute / 60
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """取一个令牌，令牌不足时等待，返回等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+# 按发件账户共享的限速器，定时提醒和手动提醒共用同一账户的额度
+_rate_limiters: Dict[str, TokenBucket] = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(config: EmailConfig) -> TokenBucket:
+    """获取发件账户对应的令牌桶"""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(config.SENDER_EMAIL)
+        if limiter is None:
+            limiter = _rate_limiters[config.SENDER_EMAIL] = TokenBucket(
+                config.REMINDER_RATE_PER_MINUTE, config.REMINDER_BURST
+            )
+        return limiter
+
 # 邮件模板类
 class EmailTemplates:
     """邮件模板管理类"""
@@ -160,13 +423,10 @@ EI Power 反馈管理系统"""
         return subject, body
     
     @staticmethod
-    def status_update_notification(username: str, feedback_id: int, feedback_content: str, 
-                                 old_status: str, new_status: str, handler_name: str = "",
-                                 admin_comment: str = "", revised_proposal: str = "",
-                                 system_url: str = "") -> Tuple[str, str]:
-        """状态更新通知邮件模板"""
-        subject = f'[问题状态更新] 您的问题 #{feedback_id} 状态已更新'
-        
+    def status_update_entry(feedback_id: int, feedback_content: str, old_status: str, new_status: str,
+                            handler_name: str = "", admin_comment: str = "",
+                            revised_proposal: str = "") -> List[str]:
+        """单个问题状态变更的正文段落（单封通知与汇总通知共用）"""
         # 状态中文映射
         status_map = {
             '新问题': '新问题',
@@ -178,25 +438,24 @@ EI Power 反馈管理系统"""
         old_status_cn = status_map.get(old_status, old_status)
         new_status_cn = status_map.get(new_status, new_status)
         
-        body_parts = [
-            f"亲爱的 {username}，",
-            "",
-            "您好！",
-            "",
-            f"您提交的问题 #{feedback_id} 状态已更新：",
-            "",
+        lines = [
             f"问题内容：{feedback_content[:100]}{'...' if len(feedback_content) > 100 else ''}",
             f"状态变更：{old_status_cn} → {new_status_cn}",
             f"处理人员：{handler_name}" if handler_name else "",
         ]
         
         if admin_comment:
-            body_parts.extend(["", "处理意见：", admin_comment])
+            lines.extend(["", "处理意见：", admin_comment])
         
         if revised_proposal:
-            body_parts.extend(["", "修正后的问题：", revised_proposal])
+            lines.extend(["", "修正后的问题：", revised_proposal])
         
-        body_parts.extend([
+        return lines
+    
+    @staticmethod
+    def status_update_footer(system_url: str = "") -> List[str]:
+        """状态更新通知结尾段落"""
+        return [
             "",
             f"您可以登录系统查看详细信息：{system_url}",
             "",
@@ -205,51 +464,99 @@ EI Power 反馈管理系统"""
             "此邮件为系统自动发送，请勿回复。",
             "",
             "EI Power 问题管理系统"
-        ])
+        ]
+    
+    @staticmethod
+    def status_update_notification(username: str, feedback_id: int, feedback_content: str, 
+                                 old_status: str, new_status: str, handler_name: str = "",
+                                 admin_comment: str = "", revised_proposal: str = "",
+                                 system_url: str = "") -> Tuple[str, str]:
+        """状态更新通知邮件模板"""
+        subject = f'[问题状态更新] 您的问题 #{feedback_id} 状态已更新'
+        
+        body_parts = [
+            f"亲爱的 {username}，",
+            "",
+            "您好！",
+            "",
+            f"您提交的问题 #{feedback_id} 状态已更新：",
+            "",
+        ]
+        body_parts.extend(EmailTemplates.status_update_entry(
+            feedback_id, feedback_content, old_status, new_status,
+            handler_name, admin_comment, revised_proposal
+        ))
+        body_parts.extend(EmailTemplates.status_update_footer(system_url))
+        
+        body = "\n".join(filter(None, body_parts))
+        return subject, body
+    
+    @staticmethod
+    def status_update_digest(username: str, entries: List[Dict[str, Any]], system_url: str = "") -> Tuple[str, str]:
+        """状态更新汇总邮件模板，entries 为 status_update_entry 的参数字典列表"""
+        subject = f'[问题状态更新] 您有 {len(entries)} 项问题状态更新'
+        
+        body_parts = [
+            f"亲爱的 {username}，",
+            "",
+            "您好！",
+            "",
+            f"您提交的问题有 {len(entries)} 项状态更新：",
+        ]
+        for entry in entries:
+            body_parts.append(f"—— 问题 #{entry['feedback_id']} ——")
+            body_parts.extend(EmailTemplates.status_update_entry(**entry))
+        body_parts.extend(EmailTemplates.status_update_footer(system_url))
         
         body = "\n".join(filter(None, body_parts))
         return subject, body
 
+# 发送邮箱：有备份邮箱时与最近一次提醒所用邮箱交替（上次用主邮箱则这次用备份邮箱），否则用主邮箱
+# users.last_reminder_email 由 reminder_logs 的插入触发器维护
+TARGET_EMAIL_SQL = '''
+    CASE
+        WHEN u.backup_email IS NOT NULL AND u.backup_email != ''
+             AND u.last_reminder_email = u.email THEN u.backup_email
+        ELSE u.email
+    END
+'''
+
 # 数据库操作类
 class DatabaseOperations:
     """数据库操作封装类"""
     
+    @staticmethod
+    def resolve_target_emails(conn, user_ids: List[int]) -> Dict[int, Optional[str]]:
+        """一条语句批量计算用户的发送邮箱 {用户ID: 邮箱}（交替使用主邮箱和备份邮箱）"""
+        if not user_ids:
+            return {}
+        placeholders = ', '.join(['?'] * len(user_ids))
+        rows = conn.execute(f'''
+            SELECT u.id, {TARGET_EMAIL_SQL} AS target_email
+            FROM users u
+            WHERE u.id IN ({placeholders})
+        ''', list(user_ids)).fetchall()
+        return {row['id']: row['target_email'] for row in rows}
+    
     @staticmethod
     def get_user_email_for_sending(user_id: int) -> Optional[str]:
         """获取用户的发送邮箱（交替使用主邮箱和备份邮箱）"""
-        with get_db_connection() as conn:
-            # 获取用户的邮箱信息
-            user = conn.execute('SELECT email, backup_email FROM users WHERE id = ?', (user_id,)).fetchone()
-            if not user:
-                return None
-            
-            # 获取该用户最近一次发送邮件使用的邮箱
-            last_email = conn.execute(
-                'SELECT email FROM reminder_logs WHERE user_id = ? ORDER BY sent_at DESC LIMIT 1',
-                (user_id,)
-            ).fetchone()
-            
-            # 如果有备份邮箱，则交替使用
-            if user['backup_email']:
-                if last_email and last_email['email'] == user['email']:
-                    return user['backup_email']  # 上次用的是主邮箱，这次用备份邮箱
-                else:
-                    return user['email']  # 上次用的是备份邮箱或者是第一次发送，这次用主邮箱
-            else:
-                return user['email']  # 没有备份邮箱，使用主邮箱
+        with db_connection() as conn:
+            return DatabaseOperations.resolve_target_emails(conn, [user_id]).get(user_id)
     
     @staticmethod
     def get_users_to_remind(today: str) -> List[Dict[str, Any]]:
         """获取需要提醒的用户列表"""
-        with get_db_connection() as conn:
-            return conn.execute('''
+        with db_connection() as conn:
+            return conn.execute(f'''
                 SELECT u.id, u.username, u.email, u.backup_email,
+                       {TARGET_EMAIL_SQL} AS target_email,
                        COALESCE(f.feedback_count, 0) as feedback_count
                 FROM users u
                 LEFT JOIN (
                     SELECT user_id, COUNT(*) as feedback_count
                     FROM feedback
-                    WHERE DATE(created_at) = ?
+                    WHERE submit_day = ?
                     GROUP BY user_id
                 ) f ON u.id = f.user_id
                 WHERE u.is_admin = 0 AND COALESCE(f.feedback_count, 0) < 3
@@ -258,7 +565,7 @@ class DatabaseOperations:
     @staticmethod
     def log_reminder_result(user_id: int, email: str, status: str, error_message: str = None):
         """记录提醒结果"""
-        with get_db_connection() as conn:
+        with db_connection() as conn:
             if error_message:
                 conn.execute(
                     'INSERT INTO reminder_logs (user_id, email, status, sent_at, error_message) VALUES (?, ?, ?, ?, ?)',
@@ -276,7 +583,7 @@ class DatabaseOperations:
                               old_status: str, new_status: str, status: str, handler_name: str = "",
                               error_message: str = None):
         """记录通知结果"""
-        with get_db_connection() as conn:
+        with db_connection() as conn:
             if error_message:
                 conn.execute('''
                     INSERT INTO notification_logs (feedback_id, user_id, email, notification_type, 
@@ -333,48 +640,94 @@ def test_email_config() -> bool:
     """测试邮件配置"""
     return email_service.test_connection()
 
-def check_and_send_reminders() -> Tuple[int, int]:
-    """检查并发送提醒邮件"""
+class ReminderDispatcher:
+    """提醒邮件分发器 - 令牌桶限速，有界线程池并发发送，返回带单封耗时的汇总"""
+    
+    def __init__(self, config: EmailConfig = None, workers: int = None):
+        self.config = config or email_config
+        self.workers = max(1, workers or self.config.REMINDER_WORKERS)
+        self.limiter = get_rate_limiter(self.config)
+    
+    def _send_one(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """限速后发送一封提醒（在线程池中执行，不访问数据库）"""
+        waited = self.limiter.acquire()
+        start = time.perf_counter()
+        result = {
+            'user_id': job['user_id'],
+            'username': job['username'],
+            'email': job['email'],
+            'status': '成功',
+            'error': None,
+        }
+        try:
+            send_reminder_email(job['email'], job['username'], job['remaining'])
+        except Exception as e:
+            result['status'] = '失败'
+            result['error'] = str(e)
+        result['wait_ms'] = round(waited * 1000, 1)
+        result['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+    
+    def dispatch(self, jobs: List[Dict[str, Any]], success_status: str = '成功',
+                 failure_status: str = '失败') -> Dict[str, Any]:
+        """发送一批提醒，jobs 为 {user_id, username, email, remaining}
+
+        发送在线程池中并发进行，结果在调用线程中逐封写入提醒日志，线程池的线程不持有数据库连接。
+        SMTP会话留在连接池中供发件箱投递复用，空闲较久的会话在复用前由NOOP检查淘汰。
+        """
+        start = time.perf_counter()
+        results = []
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs)),
+                                    thread_name_prefix='reminder') as executor:
+                for result in executor.map(self._send_one, jobs):
+                    if result['status'] == '成功':
+                        DatabaseOperations.log_reminder_result(result['user_id'], result['email'], success_status)
+                    else:
+                        DatabaseOperations.log_reminder_result(result['user_id'], result['email'],
+                                                               failure_status, result['error'])
+                    results.append(result)
+        
+        latencies = [result['latency_ms'] for result in results]
+        return {
+            'total': len(results),
+            'success': sum(1 for result in results if result['status'] == '成功'),
+            'failed': sum(1 for result in results if result['status'] == '失败'),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+            'avg_latency_ms': round(sum(latencies) / len(latencies), 1) if latencies else 0,
+            'max_latency_ms': max(latencies, default=0),
+            'results': results,
+        }
+
+def check_and_send_reminders() -> Dict[str, Any]:
+    """检查并发送提醒邮件，返回发送汇总"""
     logger.info("开始检查今日未提交反馈的用户...")
     today = date.today().strftime('%Y-%m-%d')
     
     users_to_remind = DatabaseOperations.get_users_to_remind(today)
     logger.info(f"找到 {len(users_to_remind)} 个用户需要发送提醒")
     
-    success_count = 0
-    fail_count = 0
-    
-    import time
-    
-    for i, user in enumerate(users_to_remind):
+    jobs = []
+    skipped = 0
+    for user in users_to_remind:
         remaining = 3 - user['feedback_count']
         logger.info(f"处理用户: {user['username']} (已提交: {user['feedback_count']}, 剩余: {remaining})")
         
-        # 获取要发送的邮箱地址（交替使用主邮箱和备份邮箱）
-        target_email = get_user_email_for_sending(user['id'])
+        # 发送邮箱已随用户列表一并算出（交替使用主邮箱和备份邮箱）
+        target_email = user['target_email']
         if not target_email:
             logger.warning(f"用户 {user['username']} 没有可用的邮箱地址")
+            skipped += 1
             continue
-            
-        logger.info(f"发送到邮箱: {target_email}")
         
-        try:
-            send_reminder_email(target_email, user['username'], remaining)
-            DatabaseOperations.log_reminder_result(user['id'], target_email, '成功')
-            success_count += 1
-            logger.info(f"邮件发送成功: {user['username']} ({target_email})")
-        except Exception as e:
-            DatabaseOperations.log_reminder_result(user['id'], target_email, '失败', str(e))
-            fail_count += 1
-            logger.error(f"邮件发送失败: {user['username']} ({target_email}) - {str(e)}")
-        
-        # 如果不是最后一个用户，等待10秒再发送下一封邮件
-        if i < len(users_to_remind) - 1:
-            logger.info("等待10秒后发送下一封邮件...")
-            time.sleep(10)
-    
-    logger.info(f"提醒完成 - 成功: {success_count}, 失败: {fail_count}")
-    return success_count, fail_count
+        jobs.append({'user_id': user['id'], 'username': user['username'],
+                     'email': target_email, 'remaining': remaining})
+    
+    summary = ReminderDispatcher().dispatch(jobs)
+    summary['skipped'] = skipped
+    logger.info(f"提醒完成 - 成功: {summary['success']}, 失败: {summary['failed']}, 跳过: {skipped}, "
+                f"总耗时: {summary['elapsed_ms']}ms, 平均单封: {summary['avg_latency_ms']}ms")
+    return summary
 
 def send_manual_reminder(user_identifier: str, target_email: str = None) -> Dict[str, Any]:
     """手动发送邮件提醒 - 为Web API优化的版本"""
@@ -392,15 +745,16 @@ def send_manual_reminder(user_identifier: str, target_email: str = None) -> Dict
         logger.info(f"目标用户名: {user_identifier}")
     
     # 查找用户
-    with get_db_connection() as conn:
+    with db_connection() as conn:
         users_to_remind = conn.execute(f'''
             SELECT u.id, u.username, u.email, u.backup_email,
+                   {TARGET_EMAIL_SQL} AS target_email,
                    COALESCE(f.feedback_count, 0) as feedback_count
             FROM users u
             LEFT JOIN (
                 SELECT user_id, COUNT(*) as feedback_count
                 FROM feedback
-                WHERE DATE(created_at) = ?
+                WHERE submit_day = ?
                 GROUP BY user_id
             ) f ON u.id = f.user_id
             WHERE u.is_admin = 0 AND COALESCE(f.feedback_count, 0) < 3 {where_clause}
@@ -422,7 +776,7 @@ def send_manual_reminder(user_identifier: str, target_email: str = None) -> Dict
         logger.info(f"使用指定邮箱: {target_email}")
     else:
         # 自动选择邮箱（交替使用主邮箱和备份邮箱）
-        target_email = get_user_email_for_sending(user['id'])
+        target_email = user['target_email']
         if not target_email:
             return {'success': False, 'message': f'用户 {user["username"]} 没有可用的邮箱地址'}
         logger.info(f"自动选择邮箱: {target_email}")
@@ -468,15 +822,16 @@ def send_manual_reminder_batch(user_id: int = None, username: str = None) -> Tup
         logger.info("目标: 所有未完成用户")
     
     # 查找用户
-    with get_db_connection() as conn:
+    with db_connection() as conn:
         users_to_remind = conn.execute(f'''
-            SELECT u.id, u.username, u.email,
+            SELECT u.id, u.username, u.email, u.backup_email,
+                   {TARGET_EMAIL_SQL} AS target_email,
                    COALESCE(f.feedback_count, 0) as feedback_count
             FROM users u
             LEFT JOIN (
                 SELECT user_id, COUNT(*) as feedback_count
                 FROM feedback
-                WHERE DATE(created_at) = ?
+                WHERE submit_day = ?
                 GROUP BY user_id
             ) f ON u.id = f.user_id
             WHERE u.is_admin = 0 AND COALESCE(f.feedback_count, 0) < 3 {where_clause}
@@ -488,23 +843,18 @@ def send_manual_reminder_batch(user_id: int = None, username: str = None) -> Tup
     
     logger.info(f"找到 {len(users_to_remind)} 个用户需要发送提醒")
     
-    success_count = 0
-    fail_count = 0
-    
+    # 与定时提醒相同，交替使用主邮箱和备份邮箱
+    jobs = []
     for user in users_to_remind:
-        remaining = 3 - user['feedback_count']
-        logger.info(f"处理用户: {user['username']} (已提交: {user['feedback_count']}, 剩余: {remaining})")
-        
-        try:
-            send_reminder_email(user['email'], user['username'], remaining)
-            DatabaseOperations.log_reminder_result(user['id'], user['email'], '手动成功')
-            success_count += 1
-        except Exception as e:
-            DatabaseOperations.log_reminder_result(user['id'], user['email'], '手动失败', str(e))
-            fail_count += 1
+        if not user['target_email']:
+            logger.warning(f"用户 {user['username']} 没有可用的邮箱地址")
+            continue
+        jobs.append({'user_id': user['id'], 'username': user['username'], 'email': user['target_email'],
+                     'remaining': 3 - user['feedback_count']})
+    summary = ReminderDispatcher().dispatch(jobs, success_status='手动成功', failure_status='手动失败')
     
-    logger.info(f"手动提醒完成 - 成功: {success_count}, 失败: {fail_count}")
-    return success_count, fail_count
+    logger.info(f"手动提醒完成 - 成功: {summary['success']}, 失败: {summary['failed']}, 总耗时: {summary['elapsed_ms']}ms")
+    return summary['success'], summary['failed']
 
 def send_status_update_notification(feedback_id: int, old_status: str, new_status: str, 
                                   admin_comment: str = '', revised_proposal: str = '', 
@@ -513,7 +863,7 @@ def send_status_update_notification(feedback_id: int, old_status: str, new_statu
     logger.info(f"开始发送状态更新通知邮件 - 问题ID: {feedback_id}")
     
     try:
-        with get_db_connection() as conn:
+        with db_connection() as conn:
             # 获取问题和用户信息
             feedback_info = conn.execute('''
                 SELECT f.id, f.content, f.status, f.created_at, u.id as user_id, u.username, u.email, u.name
@@ -550,7 +900,7 @@ def send_status_update_notification(feedback_id: int, old_status: str, new_statu
         
         # 记录失败日志
         try:
-            with get_db_connection() as conn:
+            with db_connection() as conn:
                 user_info = conn.execute('SELECT user_id FROM feedback WHERE id = ?', (feedback_id,)).fetchone()
                 if user_info:
                     DatabaseOperations.log_notification_result(
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面片段缓存
+管理员面板和问题列表中渲染开销大的片段（今日提交状态、待处理/已解决列表、问题列表）
+渲染后按 (片段名, 数据版本, 筛选/分页参数) 缓存在进程内存中，命中时跳过查询和模板渲染。
+键中包含数据库触发器维护的数据版本，其他进程的写入同样使旧片段失效；写入路由另外
+按片段名主动清除，及时释放内存。超过内存上限时按最近最少使用淘汰，并统计命中率
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+from markupsafe import Markup
+
+# 缓存占用内存上限（字节）
+FRAGMENT_CACHE_MAX_BYTES = int(os.getenv('FRAGMENT_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# 依赖反馈数据的片段，反馈写入路由修改后清除
+FEEDBACK_FRAGMENTS = ('admin:users_status', 'admin:pending', 'admin:resolved', 'proposals:list')
+
+class FragmentCache:
+    """按最近最少使用淘汰、限制内存占用的片段缓存（线程安全）"""
+
+    def __init__(self, max_bytes: int = FRAGMENT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[tuple, Markup]' = OrderedDict()
+        self._size = 0
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+        self.evictions = 0
+        self.invalidations = 0
+
+    def render(self, name: str, key: Hashable, render: Callable[[], str]) -> Markup:
+        """返回缓存的片段，未命中时调用 render() 渲染并缓存
+
+        key 需包含片段依赖的数据版本和参数；渲染在锁外进行，并发未命中时各自渲染一次。
+        """
+        cache_key = (name, key)
+        with self._lock:
+            html = self._entries.get(cache_key)
+            if html is not None:
+                self._entries.move_to_end(cache_key)
+                self._hits[name] = self._hits.get(name, 0) + 1
+                return html
+            self._misses[name] = self._misses.get(name, 0) + 1
+
+        html = Markup(render())
+        size = sys.getsizeof(html)
+        if size > self.max_bytes:
+            return html
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self._size -= sys.getsizeof(previous)
+            self._entries[cache_key] = html
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= sys.getsizeof(evicted)
+                self.evictions += 1
+        return html
+
+    def invalidate(self, *names: str) -> int:
+        """清除指定片段的全部缓存，不指定时清空，返回清除的条目数"""
+        with self._lock:
+            keys = [key for key in self._entries if not names or key[0] in names]
+            for key in keys:
+                self._size -= sys.getsizeof(self._entries.pop(key))
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def stats(self) -> Dict:
+        """命中率等统计信息，fragments 为各片段的命中/未命中次数"""
+        with self._lock:
+            hits = sum(self._hits.values())
+            misses = sum(self._misses.values())
+            fragments = {
+                name: {
+                    'hits': self._hits.get(name, 0),
+                    'misses': self._misses.get(name, 0),
+                    'entries': sum(1 for key in self._entries if key[0] == name),
+                }
+                for name in sorted(set(self._hits) | set(self._misses))
+            }
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'fragments': fragments,
+            }
+
+# 全局片段缓存实例
+fragment_cache = FragmentCache()
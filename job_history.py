@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+定时任务执行记录
+通过 APScheduler 事件监听把每次触发的开始/结束时间、耗时、结果、任务返回的
+成功/失败数量以及错过的触发写入 job_runs 表，供管理员页面查看各任务的耗时趋势
+
+使用方法：
+  python job_history.py list [任务ID]     # 查看最近的执行记录
+"""
+
+import sys
+import socket
+import os
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from apscheduler.events import (EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR,
+                                EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES)
+
+from database import db_connection
+
+logger = logging.getLogger(__name__)
+
+# 执行结果
+RUN_RUNNING = '运行中'
+RUN_SUCCESS = '成功'
+RUN_FAILED = '失败'
+RUN_SKIPPED = '跳过'
+RUN_MISSED = '错过'
+
+# 监听的调度器事件
+JOB_RUN_EVENTS = (EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR |
+                  EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+
+def local_time(value: datetime) -> datetime:
+    """调度器事件中的带时区时间转换为本地时间"""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+def result_counts(retval: Any) -> Tuple[Optional[int], Optional[int]]:
+    """从任务返回值中取成功/失败数量
+
+    提醒任务返回 success/failed，日志归档返回各表归档行数 tables。
+    """
+    if not isinstance(retval, dict):
+        return None, None
+    success, failed = retval.get('success'), retval.get('failed')
+    if success is None and isinstance(retval.get('tables'), dict):
+        success = sum(retval['tables'].values())
+    return success, failed
+
+class JobRunRecorder:
+    """调度器事件监听 - 记录每次触发的执行情况
+
+    提交事件由调度线程在任务提交给执行器之后才派发，执行很快的任务可能先收到
+    执行结果，此时先暂存结果，待提交事件写入开始记录后再补上。
+    """
+
+    def __init__(self):
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._lock = threading.Lock()
+        self._started: Dict[tuple, Tuple[int, datetime]] = {}
+        self._finished: Dict[tuple, tuple] = {}
+
+    def listener(self, event):
+        """注册到调度器：scheduler.add_listener(recorder.listener, JOB_RUN_EVENTS)"""
+        try:
+            if event.code == EVENT_JOB_SUBMITTED:
+                self._on_submitted(event.job_id, local_time(event.scheduled_run_times[-1]))
+            elif event.code == EVENT_JOB_MAX_INSTANCES:
+                self._insert(event.job_id, local_time(event.scheduled_run_times[-1]), RUN_SKIPPED,
+                             error_message='上一次执行尚未结束')
+            else:
+                self._on_finished(event)
+        except Exception as e:
+            logger.error(f"记录任务 {event.job_id} 执行情况失败: {str(e)}")
+
+    def _insert(self, job_id: str, fire_time: datetime, outcome: str, error_message: str = None) -> int:
+        now = datetime.now()
+        with db_connection() as conn:
+            run_id = conn.execute('''
+                INSERT INTO job_runs (job_id, fire_time, owner, started_at, outcome, error_message)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (job_id, fire_time, self.owner, now, outcome, error_message)).lastrowid
+            conn.commit()
+        return run_id
+
+    def _on_submitted(self, job_id: str, fire_time: datetime):
+        key = (job_id, fire_time)
+        with self._lock:
+            run_id = self._insert(job_id, fire_time, RUN_RUNNING)
+            self._started[key] = (run_id, datetime.now())
+            finished = self._finished.pop(key, None)
+        if finished:
+            self._finish(key, *finished)
+
+    def _on_finished(self, event):
+        key = (event.job_id, local_time(event.scheduled_run_time))
+        finished_at = datetime.now()
+        if event.code == EVENT_JOB_MISSED:
+            result = (RUN_MISSED, None, None, '超过补跑窗口，未执行', finished_at)
+        elif event.code == EVENT_JOB_ERROR:
+            result = (RUN_FAILED, None, None, str(event.exception) or type(event.exception).__name__, finished_at)
+        elif isinstance(event.retval, dict) and event.retval.get('skipped'):
+            result = (RUN_SKIPPED, None, None, event.retval.get('reason'), finished_at)
+        else:
+            result = (RUN_SUCCESS, *result_counts(event.retval), None, finished_at)
+        with self._lock:
+            if key not in self._started:
+                self._finished[key] = result
+                return
+        self._finish(key, *result)
+
+    def _finish(self, key: tuple, outcome: str, success_count: Optional[int], failed_count: Optional[int],
+                error_message: Optional[str], finished_at: datetime):
+        with self._lock:
+            run_id, started_at = self._started.pop(key)
+        duration_ms = max(0, int((finished_at - started_at).total_seconds() * 1000))
+        with db_connection() as conn:
+            conn.execute('''
+                UPDATE job_runs
+                SET finished_at = ?, duration_ms = ?, outcome = ?, success_count = ?, failed_count = ?,
+                    error_message = ?
+                WHERE id = ?
+            ''', (finished_at, duration_ms, outcome, success_count, failed_count, error_message, run_id))
+            conn.commit()
+        if outcome in (RUN_FAILED, RUN_MISSED):
+            logger.warning(f"任务 {key[0]}（{key[1]:%Y-%m-%d %H:%M:%S}）{outcome}: {error_message}")
+
+# 全局记录器实例
+job_run_recorder = JobRunRecorder()
+
+def get_job_run_overview(conn, days: int = 30, trend_size: int = 30) -> List[Dict]:
+    """各任务最近 days 天的执行概况及最近 trend_size 次成功执行的耗时（由旧到新）"""
+    since = datetime.now() - timedelta(days=days)
+    rows = conn.execute('''
+        SELECT job_id,
+               COUNT(*) AS runs,
+               SUM(outcome = ?) AS succeeded,
+               SUM(outcome = ?) AS failed,
+               SUM(outcome = ?) AS missed,
+               SUM(outcome = ?) AS skipped,
+               CAST(AVG(CASE WHEN outcome = ? THEN duration_ms END) AS INTEGER) AS avg_ms,
+               MAX(CASE WHEN outcome = ? THEN duration_ms END) AS max_ms
+        FROM job_runs
+        WHERE started_at >= ?
+        GROUP BY job_id
+        ORDER BY job_id
+    ''', (RUN_SUCCESS, RUN_FAILED, RUN_MISSED, RUN_SKIPPED, RUN_SUCCESS, RUN_SUCCESS, since)).fetchall()
+    overview = []
+    for row in rows:
+        item = dict(row)
+        last = conn.execute('''
+            SELECT fire_time, started_at, outcome, duration_ms, success_count, failed_count, error_message
+            FROM job_runs WHERE job_id = ?
+            ORDER BY started_at DESC, id DESC LIMIT 1
+        ''', (row['job_id'],)).fetchone()
+        item['last'] = dict(last) if last else None
+        trend = conn.execute('''
+            SELECT duration_ms FROM job_runs
+            WHERE job_id = ? AND outcome = ? AND started_at >= ?
+            ORDER BY started_at DESC, id DESC LIMIT ?
+        ''', (row['job_id'], RUN_SUCCESS, since, trend_size)).fetchall()
+        item['trend'] = [trend_row['duration_ms'] for trend_row in reversed(trend)]
+        overview.append(item)
+    return overview
+
+def get_job_runs(conn, job_id: str = None, limit: int = 100) -> List[Dict]:
+    """最近的执行记录，可按任务筛选"""
+    conditions = []
+    params = []
+    if job_id:
+        conditions.append('job_id = ?')
+        params.append(job_id)
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    rows = conn.execute(f'''
+        SELECT * FROM job_runs
+        {where_clause}
+        ORDER BY started_at DESC, id DESC
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+    return [dict(row) for row in rows]
+
+def get_scheduled_jobs(conn, grace_seconds: int) -> Dict[str, Dict]:
+    """任务存储中各任务的下次执行时间；超过补跑窗口仍未执行说明定时任务进程未在运行"""
+    now = datetime.now()
+    jobs = {}
+    for row in conn.execute('SELECT id, next_run_time FROM apscheduler_jobs').fetchall():
+        next_run = datetime.fromtimestamp(row['next_run_time']) if row['next_run_time'] is not None else None
+        jobs[row['id']] = {
+            'next_run_time': next_run,
+            'overdue': next_run is not None and next_run < now - timedelta(seconds=grace_seconds),
+        }
+    return jobs
+
+def sparkline_points(values: List[int], width: int = 160, height: int = 32) -> str:
+    """耗时趋势折线的 SVG polyline 坐标"""
+    if not values:
+        return ''
+    peak = max(values) or 1
+    step = width / max(1, len(values) - 1)
+    return ' '.join(f'{index * step:.1f},{height - value / peak * (height - 2) - 1:.1f}'
+                    for index, value in enumerate(values))
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+
+    if command == 'list':
+        with db_connection() as conn:
+            runs = get_job_runs(conn, sys.argv[2] if len(sys.argv) > 2 else None, limit=50)
+        for run in runs:
+            duration = f"{run['duration_ms']}ms" if run['duration_ms'] is not None else '-'
+            print(f"{run['started_at']:%Y-%m-%d %H:%M:%S}  {run['job_id']:<24} {run['outcome']:<4} {duration:>9}  "
+                  f"成功 {run['success_count'] if run['success_count'] is not None else '-'}  "
+                  f"失败 {run['failed_count'] if run['failed_count'] is not None else '-'}  "
+                  f"{run['error_message'] or ''}")
+    else:
+        print("使用方法：")
+        print("  python job_history.py list [任务ID]     # 查看最近的执行记录")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+定时任务租约
+定时任务执行前按 (任务ID, 计划触发时间) 在 job_leases 表中抢占租约，同一次触发
+无论有多少个应用进程（含调试模式下的重载进程）都只由一个进程执行；
+执行期间后台线程定期续约，进程异常退出后租约到期，其他进程可在补跑窗口内接手
+
+使用方法：
+  python job_lease.py list           # 查看最近的租约记录
+"""
+
+import os
+import sys
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from database import db_connection
+
+logger = logging.getLogger(__name__)
+
+# 租约状态
+LEASE_RUNNING = '运行中'
+LEASE_DONE = '完成'
+LEASE_FAILED = '失败'
+
+# 租约时长（秒），执行期间每隔三分之一时长续约一次
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '60'))
+# 计划触发后允许补跑的时间（秒），同时作为调度器的 misfire_grace_time
+JOB_MISFIRE_GRACE_SECONDS = int(os.getenv('JOB_MISFIRE_GRACE_SECONDS', '300'))
+# 租约记录保留天数
+JOB_LEASE_RETENTION_DAYS = int(os.getenv('JOB_LEASE_RETENTION_DAYS', '30'))
+
+def scheduled_fire_time(trigger, now: datetime = None) -> datetime:
+    """推算本次执行对应的计划触发时间（本地时间，精确到秒）
+
+    各进程执行同一次触发的时刻略有先后，但都落在触发后的补跑窗口内，
+    由触发器从窗口起点推算出的下一次触发时间相同，以此作为租约键。
+    无触发器或不在窗口内（如手动执行）时使用当前时间。
+    """
+    now = now or datetime.now()
+    if trigger is not None:
+        fire_time = trigger.get_next_fire_time(None, now - timedelta(seconds=JOB_MISFIRE_GRACE_SECONDS))
+        if fire_time is not None:
+            fire_time = fire_time.astimezone().replace(tzinfo=None)
+            if fire_time <= now:
+                return fire_time
+    return now.replace(microsecond=0)
+
+class JobLease:
+    """已抢占的租约 - 执行期间后台续约，退出时记录执行结果"""
+
+    def __init__(self, job_id: str, fire_time: datetime, owner: str, lease_seconds: int):
+        self.job_id = job_id
+        self.fire_time = fire_time
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, name=f'lease-{job_id}', daemon=True)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                now = datetime.now()
+                with db_connection() as conn:
+                    conn.execute('''
+                        UPDATE job_leases SET heartbeat_at = ?, lease_until = ?
+                        WHERE job_id = ? AND fire_time = ? AND owner = ?
+                    ''', (now, now + timedelta(seconds=self.lease_seconds),
+                          self.job_id, self.fire_time, self.owner))
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"任务 {self.job_id} 续约失败: {str(e)}")
+
+    def release(self, error: str = None):
+        """停止续约并记录执行结果，已完成的触发不会被再次执行"""
+        self._stop.set()
+        self._thread.join()
+        now = datetime.now()
+        with db_connection() as conn:
+            conn.execute('''
+                UPDATE job_leases SET status = ?, finished_at = ?, heartbeat_at = ?, error_message = ?
+                WHERE job_id = ? AND fire_time = ? AND owner = ?
+            ''', (LEASE_FAILED if error else LEASE_DONE, now, now, error,
+                  self.job_id, self.fire_time, self.owner))
+            conn.commit()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release(str(exc) if exc else None)
+        return False
+
+class JobLeaseManager:
+    """定时任务租约管理 - 按 (任务ID, 计划触发时间) 互斥"""
+
+    def __init__(self, lease_seconds: int = JOB_LEASE_SECONDS):
+        self.lease_seconds = lease_seconds
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+
+    def acquire(self, job_id: str, fire_time: datetime) -> Optional[JobLease]:
+        """抢占租约，成功返回 JobLease，已被其他进程持有或已执行完成时返回 None
+
+        首次插入即抢占成功；记录已存在时，只有未完成且租约已过期（持有进程异常退出）才可接手。
+        """
+        now = datetime.now()
+        with db_connection() as conn:
+            acquired = conn.execute('''
+                INSERT INTO job_leases (job_id, fire_time, owner, status, acquired_at, heartbeat_at, lease_until)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (job_id, fire_time) DO UPDATE SET
+                    owner = excluded.owner, acquired_at = excluded.acquired_at,
+                    heartbeat_at = excluded.heartbeat_at, lease_until = excluded.lease_until
+                WHERE job_leases.finished_at IS NULL AND job_leases.lease_until < excluded.acquired_at
+            ''', (job_id, fire_time, self.owner, LEASE_RUNNING, now, now,
+                  now + timedelta(seconds=self.lease_seconds))).rowcount
+            conn.commit()
+        if not acquired:
+            return None
+        return JobLease(job_id, fire_time, self.owner, self.lease_seconds)
+
+    def prune(self, retention_days: int = JOB_LEASE_RETENTION_DAYS) -> int:
+        """删除过期的租约记录"""
+        with db_connection() as conn:
+            count = conn.execute('DELETE FROM job_leases WHERE fire_time < ? AND finished_at IS NOT NULL',
+                                 (datetime.now() - timedelta(days=retention_days),)).rowcount
+            conn.commit()
+        return count
+
+# 全局租约管理实例
+job_lease_manager = JobLeaseManager()
+
+def run_exclusive(job_id: str, func: Callable[[], Any], trigger=None) -> Any:
+    """定时任务入口包装：抢占本次触发的租约后执行 func，未抢到时跳过并返回 {'skipped': True, ...}
+
+    trigger 为该任务的触发器，用于推算计划触发时间；需与调度器中的触发器一致。
+    """
+    fire_time = scheduled_fire_time(trigger)
+    lease = job_lease_manager.acquire(job_id, fire_time)
+    if lease is None:
+        logger.info(f"任务 {job_id}（{fire_time:%Y-%m-%d %H:%M:%S}）已由其他进程执行，跳过")
+        return {'skipped': True, 'reason': '已由其他进程执行'}
+    logger.info(f"任务 {job_id}（{fire_time:%Y-%m-%d %H:%M:%S}）开始执行")
+    with lease:
+        result = func()
+    job_lease_manager.prune()
+    return result
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+
+    if command == 'list':
+        with db_connection() as conn:
+            rows = conn.execute('''
+                SELECT job_id, fire_time, owner, status, acquired_at, finished_at, error_message
+                FROM job_leases
+                ORDER BY fire_time DESC
+                LIMIT 50
+            ''').fetchall()
+        for row in rows:
+            print(f"{row['fire_time']:%Y-%m-%d %H:%M}  {row['job_id']:<24} {row['status']:<4} "
+                  f"{row['owner']:<24} {row['error_message'] or ''}")
+    else:
+        print("使用方法：")
+        print("  python job_lease.py list           # 查看最近的租约记录")
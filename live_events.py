@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时事件推送（Server-Sent Events）
+写入路由在修改反馈的同一事务中把事件写入 live_events 表，提交后唤醒本进程的推送连接；
+推送连接按事件ID顺序读取并以 SSE 格式发送，其他进程写入的事件由定期轮询补上。
+浏览器断线重连时携带 Last-Event-ID，从上次收到的事件之后继续推送。
+每个推送连接在存续期间占用一个服务线程，因此连接时长较短（到期由浏览器自动重连），
+且每个进程同时保持的连接数有上限，超出时只补发错过的事件并让浏览器稍后重连（退化为轮询）
+
+使用方法：
+  python live_events.py list         # 查看最近的事件
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from database import db_connection
+
+# 事件类型
+EVENT_FEEDBACK = 'feedback'
+EVENT_QUOTA = 'quota'
+
+# 心跳间隔（秒），保持代理和浏览器的连接不被空闲断开
+LIVE_HEARTBEAT_SECONDS = int(os.getenv('LIVE_HEARTBEAT_SECONDS', '15'))
+# 轮询间隔（秒），用于发现其他进程写入的事件；本进程的写入由 wake() 立即推送
+LIVE_POLL_SECONDS = float(os.getenv('LIVE_POLL_SECONDS', '5'))
+# 单个连接最长保持时间（秒），到期后由浏览器自动重连，释放服务线程
+LIVE_STREAM_MAX_SECONDS = int(os.getenv('LIVE_STREAM_MAX_SECONDS', '60'))
+# 每个进程同时保持的推送连接数上限，应小于Web服务的工作线程数，为普通请求留出线程
+LIVE_MAX_STREAMS = int(os.getenv('LIVE_MAX_STREAMS', '4'))
+# 连接数已满时浏览器的重连间隔（秒）
+LIVE_BUSY_RETRY_SECONDS = int(os.getenv('LIVE_BUSY_RETRY_SECONDS', '30'))
+# 保留的事件条数，超出的旧事件在写入时删除
+LIVE_EVENT_KEEP = int(os.getenv('LIVE_EVENT_KEEP', '1000'))
+
+def publish_event(conn, event: str, data: Dict, user_id: Optional[int] = None) -> int:
+    """在调用方事务中写入事件，提交后调用 live_event_broker.wake() 立即推送
+
+    user_id 为事件所属用户，普通用户只收到自己的事件，管理员收到全部事件。
+    """
+    event_id = conn.execute(
+        'INSERT INTO live_events (event, user_id, data, created_at) VALUES (?, ?, ?, ?)',
+        (event, user_id, json.dumps(data, ensure_ascii=False, separators=(',', ':')), datetime.now())
+    ).lastrowid
+    conn.execute('DELETE FROM live_events WHERE id <= ?', (event_id - LIVE_EVENT_KEEP,))
+    return event_id
+
+def fetch_events(conn, after_id: int, user_id: Optional[int] = None, limit: int = 100) -> List[Dict]:
+    """读取 after_id 之后的事件，指定 user_id 时只读取该用户的事件"""
+    conditions = ['id > ?']
+    params = [after_id]
+    if user_id is not None:
+        conditions.append('user_id = ?')
+        params.append(user_id)
+    rows = conn.execute(f'''
+        SELECT id, event, data FROM live_events
+        WHERE {' AND '.join(conditions)}
+        ORDER BY id
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+    return [dict(row) for row in rows]
+
+def latest_event_id(conn) -> int:
+    row = conn.execute('SELECT id FROM live_events ORDER BY id DESC LIMIT 1').fetchone()
+    return row['id'] if row else 0
+
+def oldest_event_id(conn) -> int:
+    row = conn.execute('SELECT id FROM live_events ORDER BY id LIMIT 1').fetchone()
+    return row['id'] if row else 0
+
+class LiveEventBroker:
+    """本进程内的推送唤醒 - 写入路由提交后唤醒所有等待中的推送连接"""
+
+    def __init__(self, max_streams: int = LIVE_MAX_STREAMS):
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._slots = threading.BoundedSemaphore(max(1, max_streams))
+
+    @property
+    def generation(self) -> int:
+        with self._condition:
+            return self._generation
+
+    def wake(self):
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+    def wait(self, generation: int, timeout: float) -> int:
+        """等待 generation 之后的唤醒或超时，返回当前 generation"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._generation != generation, timeout)
+            return self._generation
+
+    def _catch_up(self, last_event_id: Optional[int], user_id: Optional[int]) -> Iterator[str]:
+        """确定起始事件ID并补发 last_event_id 之后的事件，最后返回推送到的事件ID
+
+        last_event_id 为空时只推送此后的事件；早于保留范围时先发送 reload 事件，提示页面整体刷新。
+        """
+        with db_connection() as conn:
+            if last_event_id is None:
+                return latest_event_id(conn)
+            if last_event_id < oldest_event_id(conn) - 1:
+                yield 'event: reload\ndata: {}\n\n'
+                return latest_event_id(conn)
+            events = fetch_events(conn, last_event_id, user_id)
+        for event in events:
+            last_event_id = event['id']
+            yield f"id: {event['id']}\nevent: {event['event']}\ndata: {event['data']}\n\n"
+        return last_event_id
+
+    def stream(self, last_event_id: Optional[int], user_id: Optional[int] = None) -> Iterator[str]:
+        """生成 SSE 数据流
+
+        在请求结束后由服务线程迭代，使用该线程自己的数据库连接。本进程的推送连接数已满时
+        只补发错过的事件，并让浏览器 LIVE_BUSY_RETRY_SECONDS 秒后重连。每次都发送当前事件ID
+        （不带数据的 id 字段），即使没有收到事件，浏览器重连时也会携带 Last-Event-ID。
+        """
+        if not self._slots.acquire(blocking=False):
+            last_event_id = yield from self._catch_up(last_event_id, user_id)
+            yield f'retry: {LIVE_BUSY_RETRY_SECONDS * 1000}\nid: {last_event_id}\n\n'
+            return
+
+        try:
+            last_event_id = yield from self._catch_up(last_event_id, user_id)
+            yield f'retry: 3000\nid: {last_event_id}\n\n'
+
+            started = last_beat = time.monotonic()
+            generation = self.generation
+            while time.monotonic() - started < LIVE_STREAM_MAX_SECONDS:
+                with db_connection() as conn:
+                    events = fetch_events(conn, last_event_id, user_id)
+                for event in events:
+                    last_event_id = event['id']
+                    yield f"id: {event['id']}\nevent: {event['event']}\ndata: {event['data']}\n\n"
+                if events:
+                    last_beat = time.monotonic()
+                    continue
+                if time.monotonic() - last_beat >= LIVE_HEARTBEAT_SECONDS:
+                    yield ': heartbeat\n\n'
+                    last_beat = time.monotonic()
+                generation = self.wait(generation, LIVE_POLL_SECONDS)
+        finally:
+            self._slots.release()
+
+# 全局推送实例
+live_event_broker = LiveEventBroker()
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+
+    if command == 'list':
+        with db_connection() as conn:
+            rows = conn.execute('SELECT * FROM live_events ORDER BY id DESC LIMIT 50').fetchall()
+        for row in rows:
+            print(f"{row['id']:>6}  {row['created_at']:%Y-%m-%d %H:%M:%S}  {row['event']:<8} "
+                  f"用户 {row['user_id'] if row['user_id'] is not None else '-':<4} {row['data']}")
+    else:
+        print("使用方法：")
+        print("  python live_events.py list         # 查看最近的事件")
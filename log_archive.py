@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志归档
+将超过保留期的 notification_logs / reminder_logs / operation_logs 按月迁移到
+归档库 archive/logs-YYYY-MM.db（可选 gzip/zstd 压缩存放），热库分批删除并增量回收空间
+
+使用方法：
+  python log_archive.py run                     # 按配置归档过期日志
+  python log_archive.py list                    # 列出归档文件
+  python log_archive.py show <表名> <YYYY-MM>    # 查看某月归档记录
+  python log_archive.py vacuum                  # 已有热库一次性切换为增量空间回收（VACUUM，需在低峰执行）
+"""
+
+import os
+import sys
+import gzip
+import shutil
+import sqlite3
+import logging
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from database import db_connection, day_range, decode_cursor, rebuild_search_index, search_index_available
+
+logger = logging.getLogger(__name__)
+
+# 可归档的日志表及其时间列
+ARCHIVE_TABLES = {
+    'notification_logs': 'sent_at',
+    'reminder_logs': 'sent_at',
+    'operation_logs': 'created_at',
+}
+
+# 压缩方式对应的文件后缀
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+class ArchiveConfig:
+    """归档配置管理类"""
+
+    def __init__(self):
+        self.ARCHIVE_DIR = os.getenv('LOG_ARCHIVE_DIR', 'archive')
+        self.RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', '90'))
+        # none / gzip / zstd，zstd 需要安装 zstandard，未安装时退回 gzip
+        self.COMPRESSION = os.getenv('LOG_ARCHIVE_COMPRESSION', 'gzip').lower()
+        self.BATCH_SIZE = int(os.getenv('LOG_ARCHIVE_BATCH_SIZE', '500'))
+
+# 全局配置实例
+archive_config = ArchiveConfig()
+
+def month_of(value) -> str:
+    """时间列取值所在月份 YYYY-MM"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m')
+    return str(value)[:7]
+
+def month_end(month: str) -> datetime:
+    """某月之后第一天的0点"""
+    year, mon = (int(part) for part in month.split('-'))
+    return datetime(year + mon // 12, mon % 12 + 1, 1)
+
+def compress_file(src: str, dst: str, method: str):
+    """流式压缩文件"""
+    with open(src, 'rb') as fin:
+        if method == 'zstd':
+            with open(dst, 'wb') as fout:
+                with zstandard.ZstdCompressor(level=10).stream_writer(fout) as writer:
+                    shutil.copyfileobj(fin, writer)
+        else:
+            with gzip.open(dst, 'wb') as fout:
+                shutil.copyfileobj(fin, fout)
+
+def decompress_file(src: str, dst: str):
+    """按后缀流式解压文件"""
+    with open(dst, 'wb') as fout:
+        if src.endswith(COMPRESSION_SUFFIXES['zstd']):
+            if zstandard is None:
+                raise RuntimeError(f'读取 {src} 需要安装 zstandard')
+            with open(src, 'rb') as fin:
+                with zstandard.ZstdDecompressor().stream_reader(fin) as reader:
+                    shutil.copyfileobj(reader, fout)
+        else:
+            with gzip.open(src, 'rb') as fin:
+                shutil.copyfileobj(fin, fout)
+
+def connect_archive(path: str, readonly: bool = False) -> sqlite3.Connection:
+    """打开归档库，行格式与热库一致（sqlite3.Row + 时间列转换）"""
+    if readonly:
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, detect_types=sqlite3.PARSE_DECLTYPES)
+    else:
+        conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+class LogArchiver:
+    """日志归档服务 - 过期日志按月迁移到归档库，并提供归档读取接口"""
+
+    def __init__(self, config: ArchiveConfig = None):
+        self.config = config or archive_config
+
+    @property
+    def compression(self) -> Optional[str]:
+        """实际使用的压缩方式，None 表示不压缩"""
+        method = self.config.COMPRESSION
+        if method == 'zstd' and zstandard is None:
+            logger.warning('未安装 zstandard，归档改用 gzip 压缩')
+            return 'gzip'
+        return method if method in COMPRESSION_SUFFIXES else None
+
+    def _plain_path(self, month: str) -> str:
+        return os.path.join(self.config.ARCHIVE_DIR, f'logs-{month}.db')
+
+    def _cache_path(self, month: str) -> str:
+        return os.path.join(self.config.ARCHIVE_DIR, '.cache', f'logs-{month}.db')
+
+    def _find_archive(self, month: str) -> Optional[str]:
+        """某月的归档文件路径，未压缩文件优先（压缩文件可能是写入前的旧版本）"""
+        plain = self._plain_path(month)
+        for path in [plain] + [plain + suffix for suffix in COMPRESSION_SUFFIXES.values()]:
+            if os.path.exists(path):
+                return path
+        return None
+
+    # ==================== 归档写入 ====================
+
+    def enable_incremental_vacuum(self, conn: sqlite3.Connection) -> bool:
+        """热库未启用增量回收时切换为 auto_vacuum=INCREMENTAL，返回是否执行了转换
+
+        需要一次性 VACUUM，期间持有写锁，只由命令行 vacuum 在低峰时执行，不在归档任务中自动进行。
+        VACUUM 可能重新编排反馈行的 rowid，完成后重建以 rowid 对应的全文检索索引。
+        """
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return False
+        logger.info('热库启用增量空间回收，执行一次性 VACUUM')
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        if search_index_available(conn):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rebuild_search_index(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return True
+
+    def _open_for_write(self, month: str) -> sqlite3.Connection:
+        """打开某月归档库用于写入，已压缩的归档先解压"""
+        plain = self._plain_path(month)
+        path = self._find_archive(month)
+        if path and path != plain:
+            decompress_file(path, plain)
+            os.remove(path)
+        return connect_archive(plain)
+
+    def _ensure_table(self, archive_conn: sqlite3.Connection, hot_conn: sqlite3.Connection, table: str):
+        """按热库表结构在归档库中建表，并为时间列建索引"""
+        exists = archive_conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        if exists:
+            return
+        sql = hot_conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()[0]
+        column = ARCHIVE_TABLES[table]
+        archive_conn.execute(sql)
+        archive_conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column}, id)')
+
+    def _archive_table(self, conn: sqlite3.Connection, table: str, cutoff: datetime) -> Dict[str, int]:
+        """分批迁移单个表中早于 cutoff 的记录，返回 {月份: 迁移行数}"""
+        column = ARCHIVE_TABLES[table]
+        moved = {}
+        archives = {}
+        try:
+            while True:
+                rows = conn.execute(f'''
+                    SELECT * FROM {table}
+                    WHERE {column} < ?
+                    ORDER BY {column}, id
+                    LIMIT ?
+                ''', (cutoff, self.config.BATCH_SIZE)).fetchall()
+                if not rows:
+                    break
+
+                columns = rows[0].keys()
+                placeholders = ', '.join(['?'] * len(columns))
+                by_month = {}
+                for row in rows:
+                    by_month.setdefault(month_of(row[column]), []).append(tuple(row))
+
+                for month, month_rows in by_month.items():
+                    archive_conn = archives.get(month)
+                    if archive_conn is None:
+                        archive_conn = archives[month] = self._open_for_write(month)
+                        self._ensure_table(archive_conn, conn, table)
+                    # 先提交归档库再删除热库记录，中途失败重跑时由 INSERT OR IGNORE 去重
+                    archive_conn.executemany(
+                        f'INSERT OR IGNORE INTO {table} ({", ".join(columns)}) VALUES ({placeholders})',
+                        month_rows
+                    )
+                    archive_conn.commit()
+                    moved[month] = moved.get(month, 0) + len(month_rows)
+
+                conn.executemany(f'DELETE FROM {table} WHERE id = ?', [(row['id'],) for row in rows])
+                conn.commit()
+                # executescript 会执行到底，execute 只回收一页
+                conn.executescript('PRAGMA incremental_vacuum;')
+        finally:
+            for archive_conn in archives.values():
+                archive_conn.close()
+        return moved
+
+    def _seal_closed_months(self, cutoff: datetime) -> List[str]:
+        """压缩已整月过期（不会再写入）的未压缩归档"""
+        method = self.compression
+        if not method or not os.path.isdir(self.config.ARCHIVE_DIR):
+            return []
+        sealed = []
+        for month in self.archived_months():
+            plain = self._plain_path(month)
+            if not os.path.exists(plain) or month_end(month) > cutoff:
+                continue
+            target = plain + COMPRESSION_SUFFIXES[method]
+            compress_file(plain, target + '.tmp', method)
+            os.replace(target + '.tmp', target)
+            os.remove(plain)
+            sealed.append(month)
+        return sealed
+
+    def archive_old_logs(self, retention_days: Optional[int] = None, tables: Optional[List[str]] = None) -> Dict:
+        """归档早于保留期的日志，返回各表迁移行数"""
+        retention = self.config.RETENTION_DAYS if retention_days is None else retention_days
+        cutoff = day_range(date.today() - timedelta(days=retention))[0]
+        os.makedirs(self.config.ARCHIVE_DIR, exist_ok=True)
+
+        summary = {'cutoff': cutoff, 'tables': {}, 'months': {}}
+        with db_connection() as conn:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                logger.warning('热库未启用增量空间回收，删除的日志不会释放磁盘空间；'
+                               '请在低峰时执行 python log_archive.py vacuum')
+            for table in tables or ARCHIVE_TABLES:
+                moved = self._archive_table(conn, table, cutoff)
+                summary['tables'][table] = sum(moved.values())
+                for month, count in moved.items():
+                    summary['months'][month] = summary['months'].get(month, 0) + count
+        summary['sealed'] = self._seal_closed_months(cutoff)
+        logger.info(f"日志归档完成，截止 {cutoff:%Y-%m-%d}：{summary['tables']}")
+        return summary
+
+    # ==================== 归档读取 ====================
+
+    def archived_months(self) -> List[str]:
+        """已有归档的月份，按时间倒序"""
+        if not os.path.isdir(self.config.ARCHIVE_DIR):
+            return []
+        months = set()
+        for name in os.listdir(self.config.ARCHIVE_DIR):
+            if name.startswith('logs-') and '.db' in name and not name.endswith('.tmp'):
+                months.add(name[len('logs-'):len('logs-YYYY-MM')])
+        return sorted(months, reverse=True)
+
+    def list_archives(self) -> List[Dict]:
+        """归档文件列表：月份、路径、大小、是否压缩"""
+        archives = []
+        for month in self.archived_months():
+            path = self._find_archive(month)
+            archives.append({
+                'month': month,
+                'path': path,
+                'size': os.path.getsize(path),
+                'compressed': path != self._plain_path(month),
+            })
+        return archives
+
+    @contextmanager
+    def open_archive(self, month: str):
+        """以只读方式打开某月归档，压缩归档解压到 .cache 并复用至源文件更新"""
+        path = self._find_archive(month)
+        if path is None:
+            raise FileNotFoundError(f'{month} 没有归档')
+        if path != self._plain_path(month):
+            cache = self._cache_path(month)
+            if not os.path.exists(cache) or os.path.getmtime(cache) < os.path.getmtime(path):
+                os.makedirs(os.path.dirname(cache), exist_ok=True)
+                decompress_file(path, cache + '.tmp')
+                os.replace(cache + '.tmp', cache)
+            path = cache
+        conn = connect_archive(path, readonly=True)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def fetch_archived_rows(self, table: str, alias: str, conditions: List[str], params: list,
+                            after: Optional[str] = None, limit: int = 50,
+                            since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Dict]:
+        """按 (时间列, id) 倒序跨月读取归档记录
+
+        conditions 中的列需带表别名 alias；after 为 encode_cursor 生成的 (时间, id) 游标；
+        since/until 用于按月份剪枝，避免打开无关的归档文件。
+        """
+        column = ARCHIVE_TABLES[table]
+        after_key = decode_cursor(after)
+        rows = []
+        for month in self.archived_months():
+            if len(rows) >= limit:
+                break
+            if until and month > month_of(until):
+                continue
+            if after_key and month > after_key[0][:7]:
+                continue
+            if since and month_end(month) <= since:
+                break
+
+            month_conditions = list(conditions)
+            month_params = list(params)
+            if after_key:
+                month_conditions.append(f'({alias}.{column}, {alias}.id) < (?, ?)')
+                month_params.extend([after_key[0], int(after_key[1])])
+            where_clause = f"WHERE {' AND '.join(month_conditions)}" if month_conditions else ''
+            with self.open_archive(month) as conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()
+                if not exists:
+                    continue
+                rows.extend(dict(row) for row in conn.execute(f'''
+                    SELECT {alias}.* FROM {table} {alias}
+                    {where_clause}
+                    ORDER BY {alias}.{column} DESC, {alias}.id DESC
+                    LIMIT ?
+                ''', month_params + [limit - len(rows)]))
+        return rows
+
+    def find_archived_record(self, table: str, record_id: int) -> Optional[Dict]:
+        """按 id 在归档中查找单条记录"""
+        for month in self.archived_months():
+            with self.open_archive(month) as conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()
+                if not exists:
+                    continue
+                row = conn.execute(f'SELECT * FROM {table} WHERE id = ?', (record_id,)).fetchone()
+                if row:
+                    return dict(row)
+        return None
+
+# 全局归档服务实例
+log_archiver = LogArchiver()
+
+def archive_old_logs():
+    """定时任务入口：按配置归档过期日志"""
+    try:
+        return log_archiver.archive_old_logs()
+    except Exception as e:
+        # 继续抛出，由调度器记录本次执行失败
+        logger.error(f"日志归档失败: {str(e)}")
+        raise
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+
+    if command == 'run':
+        summary = log_archiver.archive_old_logs()
+        print(f"截止日期: {summary['cutoff']:%Y-%m-%d}")
+        for table, count in summary['tables'].items():
+            print(f"  {table}: 归档 {count} 条")
+        if summary['sealed']:
+            print(f"已压缩月份: {', '.join(summary['sealed'])}")
+    elif command == 'list':
+        archives = log_archiver.list_archives()
+        if not archives:
+            print("暂无归档")
+        for archive in archives:
+            flag = '压缩' if archive['compressed'] else '未压缩'
+            print(f"{archive['month']}  {archive['size'] / 1024:>10.1f} KB  {flag}  {archive['path']}")
+    elif command == 'show' and len(sys.argv) > 3 and sys.argv[2] in ARCHIVE_TABLES:
+        table, month = sys.argv[2], sys.argv[3]
+        start = datetime.strptime(month, '%Y-%m')
+        rows = log_archiver.fetch_archived_rows(table, 't', [], [], limit=1000,
+                                                since=start, until=month_end(month) - timedelta(seconds=1))
+        for row in rows:
+            print(row)
+        print(f"共 {len(rows)} 条")
+    elif command == 'vacuum':
+        with db_connection() as conn:
+            converted = log_archiver.enable_incremental_vacuum(conn)
+        print("已切换为增量空间回收" if converted else "热库已启用增量空间回收，无需转换")
+    else:
+        print("使用方法：")
+        print("  python log_archive.py run                     # 按配置归档过期日志")
+        print("  python log_archive.py list                    # 列出归档文件")
+        print("  python log_archive.py show <表名> <YYYY-MM>    # 查看某月归档记录")
+        print("  python log_archive.py vacuum                  # 已有热库一次性切换为增量空间回收（VACUUM，需在低峰执行）")
+        print(f"  表名: {', '.join(ARCHIVE_TABLES)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+定时任务进程
+独立于Web进程运行 APScheduler 定时任务（提醒邮件、日志归档）和发件箱投递线程，
+Web进程只处理请求。任务保存在 SQLite 的 apscheduler_jobs 表中，进程重启后按
+补跑窗口执行错过的触发（多次错过合并为一次），同一任务不会并发执行；
+收到 SIGTERM/SIGINT 时等待正在执行的任务完成后退出
+
+使用方法：
+  python scheduler_worker.py run      # 启动定时任务进程
+  python scheduler_worker.py jobs     # 查看已保存的任务及下次执行时间
+"""
+
+import sys
+import pickle
+import signal
+import logging
+import threading
+from typing import List
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from database import db_connection, migrate
+from email_service import check_and_send_reminders, email_service
+from email_outbox import outbox_worker
+from log_archive import archive_old_logs
+from job_lease import run_exclusive, JOB_MISFIRE_GRACE_SECONDS
+from job_history import job_run_recorder, JOB_RUN_EVENTS
+
+logger = logging.getLogger(__name__)
+
+def scheduled_jobs() -> List[tuple]:
+    """定时任务定义 (任务ID, 任务函数, 触发器)，新增维护任务在此登记"""
+    return [
+        # 下午4点和6点提醒
+        ('morning_reminder_4pm', check_and_send_reminders, CronTrigger(hour=16, minute=0)),
+        ('morning_reminder_6pm', check_and_send_reminders, CronTrigger(hour=18, minute=0)),
+        # 凌晨3点归档过期日志
+        ('archive_old_logs', archive_old_logs, CronTrigger(hour=3, minute=0)),
+    ]
+
+class SQLiteJobStore(BaseJobStore):
+    """基于 sqlite3 的任务存储（无需 SQLAlchemy），任务状态以 pickle 保存在 apscheduler_jobs 表"""
+
+    def __init__(self, pickle_protocol: int = pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.pickle_protocol = pickle_protocol
+
+    def lookup_job(self, job_id):
+        with db_connection() as conn:
+            row = conn.execute('SELECT job_state FROM apscheduler_jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._reconstitute_job(row['job_state']) if row else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs('WHERE next_run_time <= ?', (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        with db_connection() as conn:
+            row = conn.execute('''
+                SELECT next_run_time FROM apscheduler_jobs
+                WHERE next_run_time IS NOT NULL
+                ORDER BY next_run_time
+                LIMIT 1
+            ''').fetchone()
+        return utc_timestamp_to_datetime(row['next_run_time']) if row else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        with db_connection() as conn:
+            exists = conn.execute('SELECT 1 FROM apscheduler_jobs WHERE id = ?', (job.id,)).fetchone()
+            if exists:
+                raise ConflictingIdError(job.id)
+            conn.execute('INSERT INTO apscheduler_jobs (id, next_run_time, job_state) VALUES (?, ?, ?)',
+                         (job.id, datetime_to_utc_timestamp(job.next_run_time), self._dump(job)))
+            conn.commit()
+
+    def update_job(self, job):
+        with db_connection() as conn:
+            updated = conn.execute('UPDATE apscheduler_jobs SET next_run_time = ?, job_state = ? WHERE id = ?',
+                                   (datetime_to_utc_timestamp(job.next_run_time), self._dump(job), job.id)).rowcount
+            conn.commit()
+        if not updated:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        with db_connection() as conn:
+            removed = conn.execute('DELETE FROM apscheduler_jobs WHERE id = ?', (job_id,)).rowcount
+            conn.commit()
+        if not removed:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        with db_connection() as conn:
+            conn.execute('DELETE FROM apscheduler_jobs')
+            conn.commit()
+
+    def _dump(self, job) -> bytes:
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state: bytes):
+        state = pickle.loads(job_state)
+        state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where: str = '', params=()):
+        with db_connection() as conn:
+            rows = conn.execute(f'SELECT id, job_state FROM apscheduler_jobs {where} ORDER BY next_run_time',
+                                params).fetchall()
+        jobs = []
+        failed_ids = []
+        for row in rows:
+            try:
+                jobs.append(self._reconstitute_job(row['job_state']))
+            except Exception:
+                # 任务函数已被删除或改名时无法恢复，移除该任务
+                self._logger.exception(f"无法恢复任务 {row['id']}，已从存储中移除")
+                failed_ids.append(row['id'])
+        if failed_ids:
+            with db_connection() as conn:
+                conn.executemany('DELETE FROM apscheduler_jobs WHERE id = ?', [(job_id,) for job_id in failed_ids])
+                conn.commit()
+        return jobs
+
+class SchedulerWorker:
+    """定时任务进程 - 托管调度器和发件箱投递线程"""
+
+    def __init__(self):
+        self.scheduler = BackgroundScheduler(
+            jobstores={'default': SQLiteJobStore()},
+            job_defaults={
+                # 多次错过的触发合并为一次执行，同一任务不并发执行
+                'coalesce': True,
+                'max_instances': 1,
+                'misfire_grace_time': JOB_MISFIRE_GRACE_SECONDS,
+            }
+        )
+        # 每次触发的耗时、结果和错过的触发记录到 job_runs
+        self.scheduler.add_listener(job_run_recorder.listener, JOB_RUN_EVENTS)
+
+    def sync_jobs(self):
+        """按任务定义同步存储中的任务
+
+        定义未变的任务保留已保存的下次执行时间，以便补跑停机期间错过的触发；
+        新增或修改的任务重新登记，已不在定义中的任务被移除。
+        """
+        defined = set()
+        for job_id, func, trigger in scheduled_jobs():
+            defined.add(job_id)
+            existing = self.scheduler.get_job(job_id)
+            if (existing and existing.func is run_exclusive and existing.args[:2] == (job_id, func)
+                    and str(existing.trigger) == str(trigger)):
+                continue
+            self.scheduler.add_job(run_exclusive, trigger=trigger, args=(job_id, func, trigger),
+                                   id=job_id, replace_existing=True)
+            logger.info(f"已登记定时任务: {job_id} {trigger}")
+        for job in self.scheduler.get_jobs():
+            if job.id not in defined:
+                job.remove()
+                logger.info(f"已移除定时任务: {job.id}")
+
+    def start(self):
+        """启动调度器和发件箱投递线程"""
+        # 先以暂停状态启动，同步任务定义后再开始调度，避免按旧定义补跑
+        self.scheduler.start(paused=True)
+        self.sync_jobs()
+        self.scheduler.resume()
+        outbox_worker.start()
+        for job in self.scheduler.get_jobs():
+            logger.info(f"定时任务 {job.id} 下次执行: {job.next_run_time}")
+
+    def stop(self):
+        """等待正在执行的任务和当前一轮投递完成后停止"""
+        logger.info("正在停止定时任务进程...")
+        self.scheduler.shutdown(wait=True)
+        outbox_worker.stop()
+        email_service.transport.close()
+        logger.info("定时任务进程已停止")
+
+def run():
+    """启动定时任务进程，直到收到 SIGTERM/SIGINT"""
+    migrate()
+    worker = SchedulerWorker()
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"收到信号 {signal.Signals(signum).name}")
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    worker.start()
+    stopping.wait()
+    worker.stop()
+
+def list_jobs():
+    """列出已保存的任务及下次执行时间"""
+    store = SQLiteJobStore()
+    for job in store.get_all_jobs():
+        next_run = job.next_run_time.strftime('%Y-%m-%d %H:%M:%S') if job.next_run_time else '已暂停'
+        print(f"{job.id:<24} {str(job.trigger):<36} 下次执行: {next_run}")
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+
+    if command == 'run':
+        run()
+    elif command == 'jobs':
+        list_jobs()
+    else:
+        print("使用方法：")
+        print("  python scheduler_worker.py run      # 启动定时任务进程")
+        print("  python scheduler_worker.py jobs     # 查看已保存的任务及下次执行时间")
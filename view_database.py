@@ -10,6 +10,9 @@ import sys
 import os
 from datetime import datetime
 
+from database import (search_index_available, build_match_query, search_feedback_page,
+                      SNIPPET_START, SNIPPET_END)
+
 def get_db_connection():
     """获取数据库连接"""
     try:
@@ -142,31 +145,27 @@ def show_feedback_summary(conn):
     except sqlite3.Error as e:
         print(f"获取统计信息失败: {e}")
 
-def search_feedback(conn, keyword):
-    """搜索反馈内容"""
+def search_feedback(conn, keyword, limit=50):
+    """搜索反馈内容，与网页问题列表共用同一查询（有全文检索索引时按相关度排序并显示高亮摘要）"""
     try:
-        cursor = conn.execute("""
-            SELECT f.id, u.name, f.content, f.status, f.created_at
-            FROM feedback f
-            JOIN users u ON f.user_id = u.id
-            WHERE f.content LIKE ? OR f.answer LIKE ?
-            ORDER BY f.created_at DESC
-        """, (f"%{keyword}%", f"%{keyword}%"))
-        
-        results = cursor.fetchall()
+        use_fts = search_index_available(conn) and build_match_query(keyword) is not None
+        results = search_feedback_page(conn, keyword, [], [], page_size=limit).items
         
-        print(f"\n=== 搜索结果: '{keyword}' (找到 {len(results)} 条) ===")
+        mode = "全文检索，按相关度排序" if use_fts else "模糊匹配"
+        print(f"\n=== 搜索结果: '{keyword}' ({mode}，显示 {len(results)} 条) ===")
         
         if not results:
             print("未找到匹配的反馈")
             return
         
         for result in results:
-            print(f"\nID: {result[0]}")
-            print(f"提交人: {result[1]}")
-            print(f"内容: {result[2][:100]}{'...' if len(result[2]) > 100 else ''}")
-            print(f"状态: {result[3]}")
-            print(f"提交时间: {result[4]}")
+            print(f"\nID: {result.id}")
+            print(f"提交人: {result.name}")
+            print(f"内容: {result.content[:100]}{'...' if len(result.content) > 100 else ''}")
+            if result.snippet:
+                print(f"匹配: {result.snippet.replace(SNIPPET_START, '【').replace(SNIPPET_END, '】')}")
+            print(f"状态: {result.status}")
+            print(f"提交时间: {result.created_at}")
             print("-" * 50)
             
     except sqlite3.Error as e: